@@ -1,1271 +1,52 @@
 import logging
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 from telegram import Update, ChatMember
 from telegram.ext import ContextTypes
-from database import Database
 from config import Config
 from keyboards import Keyboards
 from utils import Utils
+from broadcast import (
+    BroadcastEngine, BROADCAST_SEGMENTS, SEGMENT_FORMAT_HELP,
+    describe_segment, message_media, parse_busy_hours, parse_schedule, parse_segment
+)
+from notifications import NotificationOutbox, NotificationQueue
+from rate_limiter import TokenBucket
 
-# Initialize database
-db = Database()
+logger = logging.getLogger(__name__)
 
 class AdminHandlers:
-    @staticmethod
-    async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show admin menu"""
-        user_id = update.effective_user.id
-        
-        if not Utils.is_admin(user_id):
-            await update.message.reply_text("❌ غير مصرح لك بالوصول")
-            return
-        
-        stats = db.get_stats()
-        
-        text = f"""
-👑 لوحة تحكم الأدمن
-
-📊 الإحصائيات:
-👥 إجمالي المستخدمين: {Utils.format_number(stats['total_users'])}
-📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
-⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
-        """
-        
-        await update.message.reply_text(
-            text,
-            reply_markup=Keyboards.admin_menu()
-        )
-    
-    @staticmethod
-    async def handle_admin_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle admin text messages"""
-        text = update.message.text
-        user_id = update.effective_user.id
-        
-        if not Utils.is_admin(user_id):
-            return
-        
-        if text == "📊 إحصائيات البوت":
-            await AdminHandlers.bot_stats(update, context)
-        elif text == "👥 المستخدمين":
-            await AdminHandlers.users_list(update, context)
-        elif text == "📢 إدارة القنوات":
-            await AdminHandlers.channels_management(update, context)
-        elif text == "📦 إدارة الطلبات":
-            await AdminHandlers.orders_management(update, context)
-        elif text == "✉️ رسالة جماعية":
-            await AdminHandlers.broadcast_message(update, context)
-        elif text == "💎 إرسال نقاط":
-            await AdminHandlers.send_points(update, context)
-        elif text == "🔙 القائمة الرئيسية":
-            await update.message.reply_text(
-                "🏠 القائمة الرئيسية",
-                reply_markup=Keyboards.main_menu()
-            )
-    
-    @staticmethod
-    async def handle_admin_callback(query, context):
-        """Handle admin callbacks"""
-        data = query.data
-        user_id = query.from_user.id
-        
-        if not Utils.is_admin(user_id):
-            await query.answer("❌ غير مصرح لك بالوصول")
-            return
-        
-        if data == "add_channel":
-            await query.edit_message_text(
-                "📢 إضافة قناة جديدة\n\n"
-                "أرسل معلومات القناة بالتنسيق التالي:\n"
-                "معرف_القناة|اسم_القناة|نقاط_المكافأة\n\n"
-                "مثال:\n"
-                "@mychannel|قناتي الرسمية|15"
-            )
-            context.user_data['admin_waiting_for'] = 'channel_info'
-        
-        elif data == "remove_channel":
-            channels = db.get_all_channels()
-            if not channels:
-                await query.edit_message_text("❌ لا توجد قنوات لحذفها")
-                return
-            
-            text = "❌ اختر القناة المراد حذفها:\n\n"
-            for i, channel in enumerate(channels):
-                text += f"{i+1}. {channel[2]} (@{channel[3]})\n"
-            
-            text += "\nأرسل رقم القناة:"
-            await query.edit_message_text(text)
-            context.user_data['admin_waiting_for'] = 'remove_channel'
-            context.user_data['channels_list'] = channels
-        
-        elif data == "list_channels":
-            await AdminHandlers.list_channels(query, context)
-        
-        elif data == "all_orders":
-            await AdminHandlers.all_orders(query, context)
-        
-        elif data == "pending_orders":
-            await AdminHandlers.pending_orders(query, context)
-        
-        elif data == "complete_order":
-            await query.edit_message_text(
-                "✅ إكمال طلب\n\n"
-                "أرسل رقم الطلب المراد إكماله:"
-            )
-            context.user_data['admin_waiting_for'] = 'complete_order'
-        
-        elif data == "cancel_order_admin":
-            await query.edit_message_text(
-                "❌ إلغاء طلب\n\n"
-                "أرسل رقم الطلب المراد إلغاؤه:"
-            )
-            context.user_data['admin_waiting_for'] = 'cancel_order'
-        
-        elif data.startswith("admin_complete_"):
-            order_id = int(data.replace("admin_complete_", ""))
-            await AdminHandlers.complete_order(query, context, order_id)
-        
-        elif data.startswith("admin_cancel_"):
-            order_id = int(data.replace("admin_cancel_", ""))
-            await AdminHandlers.cancel_order(query, context, order_id)
-        
-        elif data == "back_to_admin":
-            await AdminHandlers.admin_menu_callback(query, context)
-    
-    @staticmethod
-    async def handle_admin_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle admin input"""
-        text = update.message.text
-        user_id = update.effective_user.id
-        
-        if not Utils.is_admin(user_id):
-            return
-        
-        waiting_for = context.user_data.get('admin_waiting_for')
-        
-        if waiting_for == 'channel_info':
-            await AdminHandlers.process_channel_info(update, context)
-        elif waiting_for == 'remove_channel':
-            await AdminHandlers.process_remove_channel(update, context)
-        elif waiting_for == 'complete_order':
-            await AdminHandlers.process_complete_order(update, context)
-        elif waiting_for == 'cancel_order':
-            await AdminHandlers.process_cancel_order(update, context)
-        elif waiting_for == 'broadcast_message':
-            await AdminHandlers.process_broadcast(update, context)
-        elif waiting_for == 'send_points_user':
-            await AdminHandlers.process_send_points_user(update, context)
-        elif waiting_for == 'send_points_amount':
-            await AdminHandlers.process_send_points_amount(update, context)
-    
-    @staticmethod
-    async def bot_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show bot statistics"""
-        stats = db.get_stats()
-        
-        text = f"""
-📊 إحصائيات البوت المفصلة:
-
-👥 المستخدمين: {Utils.format_number(stats['total_users'])}
-📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
-⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-✅ الطلبات المكتملة: {Utils.format_number(stats['total_orders'] - stats['pending_orders'])}
-📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
-        """
-        
-        await update.message.reply_text(text)
-    
-    @staticmethod
-    async def users_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show users list"""
-        # Get recent users (last 20)
-        with Database().db_name as db_name:
-            import sqlite3
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT user_id, username, first_name, points, referrals, joined_date 
-                FROM users 
-                ORDER BY joined_date DESC 
-                LIMIT 20
-            ''')
-            users = cursor.fetchall()
-            conn.close()
-        
-        if not users:
-            await update.message.reply_text("❌ لا توجد مستخدمين")
-            return
-        
-        text = "👥 آخر المستخدمين:\n\n"
-        
-        for user in users:
-            user_id, username, first_name, points, referrals, joined_date = user
-            text += f"""
-👤 {first_name} (@{username or 'N/A'})
-🆔 {user_id}
-💎 النقاط: {Utils.format_number(points)}
-👥 الإحالات: {referrals}
-📅 {Utils.format_date(joined_date)}
-────────────────
-            """
-        
-        await update.message.reply_text(text)
-    
-    @staticmethod
-    async def channels_management(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show channels management"""
-        await update.message.reply_text(
-            "📢 إدارة القنوات",
-            reply_markup=Keyboards.admin_channels_keyboard()
-        )
-    
-    @staticmethod
-    async def orders_management(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show orders management"""
-        await update.message.reply_text(
-            "📦 إدارة الطلبات",
-            reply_markup=Keyboards.admin_orders_keyboard()
-        )
-    
-    @staticmethod
-    async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Broadcast message to all users"""
-        await update.message.reply_text(
-            "✉️ إرسال رسالة جماعية\n\n"
-            "أرسل الرسالة التي تريد إرسالها لجميع المستخدمين:"
-        )
-        context.user_data['admin_waiting_for'] = 'broadcast_message'
-    
-    @staticmethod
-    async def send_points(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Send points to user"""
-        await update.message.reply_text(
-            "💎 إرسال نقاط\n\n"
-            "أرسل معرف المستخدم:"
-        )
-        context.user_data['admin_waiting_for'] = 'send_points_user'
-    
-    @staticmethod
-    async def process_channel_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process channel information"""
-        text = update.message.text
-        
-        try:
-            parts = text.split('|')
-            if len(parts) != 3:
-                await update.message.reply_text("❌ تنسيق خاطئ. استخدم: معرف_القناة|اسم_القناة|نقاط_المكافأة")
-                return
-            
-            channel_id = parts[0].strip()
-            channel_name = parts[1].strip()
-            points_reward = int(parts[2].strip())
-            
-            # Remove @ if present
-            channel_username = channel_id.replace('@', '') if channel_id.startswith('@') else None
-            
-            if db.add_channel(channel_id, channel_name, channel_username, points_reward):
-                await update.message.reply_text(
-                    f"✅ تم إضافة القناة بنجاح!\n\n"
-                    f"📢 القناة: {channel_name}\n"
-                    f"🆔 المعرف: {channel_id}\n"
-                    f"💎 المكافأة: {points_reward} نقطة"
-                )
-                db.log_admin_action(update.effective_user.id, "add_channel", f"{channel_name} - {channel_id}")
-            else:
-                await update.message.reply_text("❌ القناة موجودة مسبقاً")
-        
-        except ValueError:
-            await update.message.reply_text("❌ نقاط المكافأة يجب أن تكون رقماً")
-        except Exception as e:
-            await update.message.reply_text(f"❌ حدث خطأ: {str(e)}")
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_remove_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process channel removal"""
-        text = update.message.text
-        
-        try:
-            channel_index = int(text) - 1
-            channels = context.user_data.get('channels_list', [])
-            
-            if 0 <= channel_index < len(channels):
-                channel = channels[channel_index]
-                channel_id = channel[1]
-                channel_name = channel[2]
-                
-                if db.remove_channel(channel_id):
-                    await update.message.reply_text(f"✅ تم حذف القناة: {channel_name}")
-                    db.log_admin_action(update.effective_user.id, "remove_channel", f"{channel_name} - {channel_id}")
-                else:
-                    await update.message.reply_text("❌ فشل في حذف القناة")
-            else:
-                await update.message.reply_text("❌ رقم القناة غير صحيح")
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم صحيح")
-        
-        context.user_data.pop('admin_waiting_for', None)
-        context.user_data.pop('channels_list', None)
-    
-    @staticmethod
-    async def process_complete_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process order completion"""
-        text = update.message.text
-        
-        try:
-            order_id = int(text)
-            db.update_order_status(order_id, 'completed')
-            
-            await update.message.reply_text(f"✅ تم إكمال الطلب #{order_id}")
-            db.log_admin_action(update.effective_user.id, "complete_order", f"Order #{order_id}")
-            
-            # Notify user
-            # Get order details to notify user
-            orders = db.get_all_orders()
-            order = next((o for o in orders if o[0] == order_id), None)
-            if order:
-                user_id = order[1]
-                await context.bot.send_message(
-                    user_id,
-                    f"✅ تم إكمال طلبك #{order_id} بنجاح!\n"
-                    f"شكراً لاستخدام البوت 🎉"
-                )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم الطلب")
-        except Exception as e:
-            await update.message.reply_text(f"❌ حدث خطأ: {str(e)}")
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process order cancellation"""
-        text = update.message.text
-        
-        try:
-            order_id = int(text)
-            
-            # Get order details first
-            orders = db.get_all_orders()
-            order = next((o for o in orders if o[0] == order_id), None)
-            
-            if not order:
-                await update.message.reply_text("❌ الطلب غير موجود")
-                return
-            
-            user_id = order[1]
-            points_cost = order[5]
-            
-            # Refund points
-            db.update_user_points(user_id, points_cost)
-            db.update_order_status(order_id, 'cancelled')
-            
-            await update.message.reply_text(f"✅ تم إلغاء الطلب #{order_id} واسترداد النقاط")
-            db.log_admin_action(update.effective_user.id, "cancel_order", f"Order #{order_id}")
-            
-            # Notify user
-            await context.bot.send_message(
-                user_id,
-                f"❌ تم إلغاء طلبك #{order_id}\n"
-                f"💎 تم استرداد {Utils.format_number(points_cost)} نقطة"
-            )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم الطلب")
-        except Exception as e:
-            await update.message.reply_text(f"❌ حدث خطأ: {str(e)}")
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process broadcast message"""
-        message = update.message.text
-        
-        # Get all users
-        with Database().db_name as db_name:
-            import sqlite3
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute('SELECT user_id FROM users WHERE is_banned = 0')
-            users = cursor.fetchall()
-            conn.close()
-        
-        sent_count = 0
-        failed_count = 0
-        
-        await update.message.reply_text(f"📤 بدء إرسال الرسالة لـ {len(users)} مستخدم...")
-        
-        for user in users:
-            user_id = user[0]
-            try:
-                await context.bot.send_message(user_id, message)
-                sent_count += 1
-            except Exception:
-                failed_count += 1
-        
-        await update.message.reply_text(
-            f"📊 تم إرسال الرسالة:\n"
-            f"✅ نجح: {sent_count}\n"
-            f"❌ فشل: {failed_count}"
-        )
-        
-        db.log_admin_action(
-            update.effective_user.id, 
-            "broadcast", 
-            f"Sent to {sent_count} users, failed {failed_count}"
-        )
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_send_points_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process send points user selection"""
-        text = update.message.text
-        
-        try:
-            user_id = int(text)
-            user_data = db.get_user(user_id)
-            
-            if not user_data:
-                await update.message.reply_text("❌ المستخدم غير موجود")
-                return
-            
-            context.user_data['target_user_id'] = user_id
-            context.user_data['admin_waiting_for'] = 'send_points_amount'
-            
-            await update.message.reply_text(
-                f"👤 المستخدم: {user_data[2]} (@{user_data[1] or 'N/A'})\n"
-                f"💎 النقاط الحالية: {Utils.format_number(user_data[3])}\n\n"
-                f"أرسل كمية النقاط المراد إرسالها:"
-            )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال معرف المستخدم (رقم)")
-    
-    @staticmethod
-    async def process_send_points_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process send points amount"""
-        text = update.message.text
-        
-        try:
-            points = int(text)
-            user_id = context.user_data.get('target_user_id')
-            
-            if not user_id:
-                await update.message.reply_text("❌ خطأ في بيانات المستخدم")
-                return
-            
-            db.update_user_points(user_id, points)
-            
-            await update.message.reply_text(
-                f"✅ تم إرسال {Utils.format_number(points)} نقطة بنجاح!"
-            )
-            
-            # Notify user
-            await context.bot.send_message(
-                user_id,
-                f"🎉 تم منحك {Utils.format_number(points)} نقطة من الإدارة!\n"
-                f"💎 رصيدك الحالي: {Utils.format_number(db.get_user(user_id)[3])} نقطة"
-            )
-            
-            db.log_admin_action(
-                update.effective_user.id,
-                "send_points",
-                f"Sent {points} points to user {user_id}"
-            )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم صحيح")
-        
-        context.user_data.pop('admin_waiting_for', None)
-        context.user_data.pop('target_user_id', None)
-    
-    @staticmethod
-    async def list_channels(query, context):
-        """List all channels"""
-        channels = db.get_all_channels()
-        
-        if not channels:
-            await query.edit_message_text("❌ لا توجد قنوات")
-            return
-        
-        text = "📢 قائمة القنوات:\n\n"
-        
-        for channel in channels:
-            channel_id, channel_name, channel_username, points_reward = channel[1], channel[2], channel[3], channel[4]
-            text += f"""
-📢 {channel_name}
-🆔 {channel_id}
-💎 المكافأة: {points_reward} نقطة
-📅 {Utils.format_date(channel[6])}
-────────────────
-            """
-        
-        await query.edit_message_text(text)
-    
-    @staticmethod
-    async def all_orders(query, context):
-        """Show all orders"""
-        orders = db.get_all_orders()
-        
-        if not orders:
-            await query.edit_message_text("❌ لا توجد طلبات")
-            return
-        
-        text = "📋 جميع الطلبات (آخر 20):\n\n"
-        
-        for order in orders[-20:]:
-            order_id, user_id, service_type, target_url, quantity, points_cost, status, created_date, completed_date, username = order
-            text += f"""
-🔸 طلب #{order_id}
-👤 @{username or 'N/A'}
-🚀 {Utils.format_service_name(service_type)}
-📊 {Utils.format_number(quantity)}
-💎 {Utils.format_number(points_cost)} نقطة
-📈 {Utils.format_order_status(status)}
-📅 {Utils.format_date(created_date)}
-────────────────
-            """
-        
-        await query.edit_message_text(text)
-    
-    @staticmethod
-    async def pending_orders(query, context):
-        """Show pending orders"""
-        orders = db.get_all_orders()
-        pending_orders = [o for o in orders if o[6] == 'pending']
-        
-        if not pending_orders:
-            await query.edit_message_text("✅ لا توجد طلبات معلقة")
-            return
-        
-        text = "⏳ الطلبات المعلقة:\n\n"
-        
-        for order in pending_orders:
-            order_id, user_id, service_type, target_url, quantity, points_cost, status, created_date, completed_date, username = order
-            text += f"""
-🔸 طلب #{order_id}
-👤 @{username or 'N/A'}
-🚀 {Utils.format_service_name(service_type)}
-🎯 {target_url}
-📊 {Utils.format_number(quantity)}
-💎 {Utils.format_number(points_cost)} نقطة
-📅 {Utils.format_date(created_date)}
-────────────────
-            """
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=None
-        )
-    
-    @staticmethod
-    async def complete_order(query, context, order_id):
-        """Complete specific order"""
-        db.update_order_status(order_id, 'completed')
-        
-        await query.edit_message_text(f"✅ تم إكمال الطلب #{order_id}")
-        db.log_admin_action(query.from_user.id, "complete_order", f"Order #{order_id}")
-        
-        # Get order details to notify user
-        orders = db.get_all_orders()
-        order = next((o for o in orders if o[0] == order_id), None)
-        if order:
-            user_id = order[1]
-            await context.bot.send_message(
-                user_id,
-                f"✅ تم إكمال طلبك #{order_id} بنجاح!\n"
-                f"شكراً لاستخدام البوت 🎉"
-            )
-    
-    @staticmethod
-    async def cancel_order(query, context, order_id):
-        """Cancel specific order"""
-        # Get order details first
-        orders = db.get_all_orders()
-        order = next((o for o in orders if o[0] == order_id), None)
-        
-        if not order:
-            await query.edit_message_text("❌ الطلب غير موجود")
-            return
-        
-        user_id = order[1]
-        points_cost = order[5]
-        
-        # Refund points
-        db.update_user_points(user_id, points_cost)
-        db.update_order_status(order_id, 'cancelled')
-        
-        await query.edit_message_text(f"✅ تم إلغاء الطلب #{order_id} واسترداد النقاط")
-        db.log_admin_action(query.from_user.id, "cancel_order", f"Order #{order_id}")
-        
-        # Notify user
-        await context.bot.send_message(
-            user_id,
-            f"❌ تم إلغاء طلبك #{order_id}\n"
-            f"💎 تم استرداد {Utils.format_number(points_cost)} نقطة"
-        )
-    
-    @staticmethod
-    async def admin_menu_callback(query, context):
-        """Show admin menu callback"""
-        stats = db.get_stats()
-        
-        text = f"""
-👑 لوحة تحكم الأدمن
-
-📊 الإحصائيات:
-👥 إجمالي المستخدمين: {Utils.format_number(stats['total_users'])}
-📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
-⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
-        """
-        
-        await query.edit_message_text(text)import logging
-from telegram import Update, ChatMember
-from telegram.ext import ContextTypes
-from database import Database
-from config import Config
-from keyboards import Keyboards
-from utils import Utils
-
-# Initialize database
-db = Database()
-
-class AdminHandlers:
-    @staticmethod
-    async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show admin menu"""
-        user_id = update.effective_user.id
-        
-        if not Utils.is_admin(user_id):
-            await update.message.reply_text("❌ غير مصرح لك بالوصول")
-            return
-        
-        stats = db.get_stats()
-        
-        text = f"""
-👑 لوحة تحكم الأدمن
-
-📊 الإحصائيات:
-👥 إجمالي المستخدمين: {Utils.format_number(stats['total_users'])}
-📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
-⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
-        """
-        
-        await update.message.reply_text(
-            text,
-            reply_markup=Keyboards.admin_menu()
-        )
-    
-    @staticmethod
-    async def handle_admin_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle admin text messages"""
-        text = update.message.text
-        user_id = update.effective_user.id
-        
-        if not Utils.is_admin(user_id):
-            return
-        
-        if text == "📊 إحصائيات البوت":
-            await AdminHandlers.bot_stats(update, context)
-        elif text == "👥 المستخدمين":
-            await AdminHandlers.users_list(update, context)
-        elif text == "📢 إدارة القنوات":
-            await AdminHandlers.channels_management(update, context)
-        elif text == "📦 إدارة الطلبات":
-            await AdminHandlers.orders_management(update, context)
-        elif text == "✉️ رسالة جماعية":
-            await AdminHandlers.broadcast_message(update, context)
-        elif text == "💎 إرسال نقاط":
-            await AdminHandlers.send_points(update, context)
-        elif text == "🔙 القائمة الرئيسية":
-            await update.message.reply_text(
-                "🏠 القائمة الرئيسية",
-                reply_markup=Keyboards.main_menu()
-            )
-    
-    @staticmethod
-    async def handle_admin_callback(query, context):
-        """Handle admin callbacks"""
-        data = query.data
-        user_id = query.from_user.id
-        
-        if not Utils.is_admin(user_id):
-            await query.answer("❌ غير مصرح لك بالوصول")
-            return
-        
-        if data == "add_channel":
-            await query.edit_message_text(
-                "📢 إضافة قناة جديدة\n\n"
-                "أرسل معلومات القناة بالتنسيق التالي:\n"
-                "معرف_القناة|اسم_القناة|نقاط_المكافأة\n\n"
-                "مثال:\n"
-                "@mychannel|قناتي الرسمية|15"
-            )
-            context.user_data['admin_waiting_for'] = 'channel_info'
-        
-        elif data == "remove_channel":
-            channels = db.get_all_channels()
-            if not channels:
-                await query.edit_message_text("❌ لا توجد قنوات لحذفها")
-                return
-            
-            text = "❌ اختر القناة المراد حذفها:\n\n"
-            for i, channel in enumerate(channels):
-                text += f"{i+1}. {channel[2]} (@{channel[3]})\n"
-            
-            text += "\nأرسل رقم القناة:"
-            await query.edit_message_text(text)
-            context.user_data['admin_waiting_for'] = 'remove_channel'
-            context.user_data['channels_list'] = channels
-        
-        elif data == "list_channels":
-            await AdminHandlers.list_channels(query, context)
-        
-        elif data == "all_orders":
-            await AdminHandlers.all_orders(query, context)
-        
-        elif data == "pending_orders":
-            await AdminHandlers.pending_orders(query, context)
-        
-        elif data == "complete_order":
-            await query.edit_message_text(
-                "✅ إكمال طلب\n\n"
-                "أرسل رقم الطلب المراد إكماله:"
-            )
-            context.user_data['admin_waiting_for'] = 'complete_order'
-        
-        elif data == "cancel_order_admin":
-            await query.edit_message_text(
-                "❌ إلغاء طلب\n\n"
-                "أرسل رقم الطلب المراد إلغاؤه:"
-            )
-            context.user_data['admin_waiting_for'] = 'cancel_order'
-        
-        elif data.startswith("admin_complete_"):
-            order_id = int(data.replace("admin_complete_", ""))
-            await AdminHandlers.complete_order(query, context, order_id)
-        
-        elif data.startswith("admin_cancel_"):
-            order_id = int(data.replace("admin_cancel_", ""))
-            await AdminHandlers.cancel_order(query, context, order_id)
-        
-        elif data == "back_to_admin":
-            await AdminHandlers.admin_menu_callback(query, context)
-    
-    @staticmethod
-    async def handle_admin_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle admin input"""
-        text = update.message.text
-        user_id = update.effective_user.id
-        
-        if not Utils.is_admin(user_id):
-            return
-        
-        waiting_for = context.user_data.get('admin_waiting_for')
-        
-        if waiting_for == 'channel_info':
-            await AdminHandlers.process_channel_info(update, context)
-        elif waiting_for == 'remove_channel':
-            await AdminHandlers.process_remove_channel(update, context)
-        elif waiting_for == 'complete_order':
-            await AdminHandlers.process_complete_order(update, context)
-        elif waiting_for == 'cancel_order':
-            await AdminHandlers.process_cancel_order(update, context)
-        elif waiting_for == 'broadcast_message':
-            await AdminHandlers.process_broadcast(update, context)
-        elif waiting_for == 'send_points_user':
-            await AdminHandlers.process_send_points_user(update, context)
-        elif waiting_for == 'send_points_amount':
-            await AdminHandlers.process_send_points_amount(update, context)
-    
-    @staticmethod
-    async def bot_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show bot statistics"""
-        stats = db.get_stats()
-        
-        text = f"""
-📊 إحصائيات البوت المفصلة:
-
-👥 المستخدمين: {Utils.format_number(stats['total_users'])}
-📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
-⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-✅ الطلبات المكتملة: {Utils.format_number(stats['total_orders'] - stats['pending_orders'])}
-📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
-        """
-        
-        await update.message.reply_text(text)
-    
-    @staticmethod
-    async def users_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show users list"""
-        # Get recent users (last 20)
-        with Database().db_name as db_name:
-            import sqlite3
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT user_id, username, first_name, points, referrals, joined_date 
-                FROM users 
-                ORDER BY joined_date DESC 
-                LIMIT 20
-            ''')
-            users = cursor.fetchall()
-            conn.close()
-        
-        if not users:
-            await update.message.reply_text("❌ لا توجد مستخدمين")
-            return
-        
-        text = "👥 آخر المستخدمين:\n\n"
-        
-        for user in users:
-            user_id, username, first_name, points, referrals, joined_date = user
-            text += f"""
-👤 {first_name} (@{username or 'N/A'})
-🆔 {user_id}
-💎 النقاط: {Utils.format_number(points)}
-👥 الإحالات: {referrals}
-📅 {Utils.format_date(joined_date)}
-────────────────
-            """
-        
-        await update.message.reply_text(text)
-    
-    @staticmethod
-    async def channels_management(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show channels management"""
-        await update.message.reply_text(
-            "📢 إدارة القنوات",
-            reply_markup=Keyboards.admin_channels_keyboard()
-        )
-    
-    @staticmethod
-    async def orders_management(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show orders management"""
-        await update.message.reply_text(
-            "📦 إدارة الطلبات",
-            reply_markup=Keyboards.admin_orders_keyboard()
-        )
-    
-    @staticmethod
-    async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Broadcast message to all users"""
-        await update.message.reply_text(
-            "✉️ إرسال رسالة جماعية\n\n"
-            "أرسل الرسالة التي تريد إرسالها لجميع المستخدمين:"
-        )
-        context.user_data['admin_waiting_for'] = 'broadcast_message'
-    
-    @staticmethod
-    async def send_points(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Send points to user"""
-        await update.message.reply_text(
-            "💎 إرسال نقاط\n\n"
-            "أرسل معرف المستخدم:"
-        )
-        context.user_data['admin_waiting_for'] = 'send_points_user'
-    
-    @staticmethod
-    async def process_channel_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process channel information"""
-        text = update.message.text
-        
-        try:
-            parts = text.split('|')
-            if len(parts) != 3:
-                await update.message.reply_text("❌ تنسيق خاطئ. استخدم: معرف_القناة|اسم_القناة|نقاط_المكافأة")
-                return
-            
-            channel_id = parts[0].strip()
-            channel_name = parts[1].strip()
-            points_reward = int(parts[2].strip())
-            
-            # Remove @ if present
-            channel_username = channel_id.replace('@', '') if channel_id.startswith('@') else None
-            
-            if db.add_channel(channel_id, channel_name, channel_username, points_reward):
-                await update.message.reply_text(
-                    f"✅ تم إضافة القناة بنجاح!\n\n"
-                    f"📢 القناة: {channel_name}\n"
-                    f"🆔 المعرف: {channel_id}\n"
-                    f"💎 المكافأة: {points_reward} نقطة"
-                )
-                db.log_admin_action(update.effective_user.id, "add_channel", f"{channel_name} - {channel_id}")
-            else:
-                await update.message.reply_text("❌ القناة موجودة مسبقاً")
-        
-        except ValueError:
-            await update.message.reply_text("❌ نقاط المكافأة يجب أن تكون رقماً")
-        except Exception as e:
-            await update.message.reply_text(f"❌ حدث خطأ: {str(e)}")
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_remove_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process channel removal"""
-        text = update.message.text
-        
-        try:
-            channel_index = int(text) - 1
-            channels = context.user_data.get('channels_list', [])
-            
-            if 0 <= channel_index < len(channels):
-                channel = channels[channel_index]
-                channel_id = channel[1]
-                channel_name = channel[2]
-                
-                if db.remove_channel(channel_id):
-                    await update.message.reply_text(f"✅ تم حذف القناة: {channel_name}")
-                    db.log_admin_action(update.effective_user.id, "remove_channel", f"{channel_name} - {channel_id}")
-                else:
-                    await update.message.reply_text("❌ فشل في حذف القناة")
-            else:
-                await update.message.reply_text("❌ رقم القناة غير صحيح")
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم صحيح")
-        
-        context.user_data.pop('admin_waiting_for', None)
-        context.user_data.pop('channels_list', None)
-    
-    @staticmethod
-    async def process_complete_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process order completion"""
-        text = update.message.text
-        
-        try:
-            order_id = int(text)
-            db.update_order_status(order_id, 'completed')
-            
-            await update.message.reply_text(f"✅ تم إكمال الطلب #{order_id}")
-            db.log_admin_action(update.effective_user.id, "complete_order", f"Order #{order_id}")
-            
-            # Notify user
-            # Get order details to notify user
-            orders = db.get_all_orders()
-            order = next((o for o in orders if o[0] == order_id), None)
-            if order:
-                user_id = order[1]
-                await context.bot.send_message(
-                    user_id,
-                    f"✅ تم إكمال طلبك #{order_id} بنجاح!\n"
-                    f"شكراً لاستخدام البوت 🎉"
-                )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم الطلب")
-        except Exception as e:
-            await update.message.reply_text(f"❌ حدث خطأ: {str(e)}")
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process order cancellation"""
-        text = update.message.text
-        
-        try:
-            order_id = int(text)
-            
-            # Get order details first
-            orders = db.get_all_orders()
-            order = next((o for o in orders if o[0] == order_id), None)
-            
-            if not order:
-                await update.message.reply_text("❌ الطلب غير موجود")
-                return
-            
-            user_id = order[1]
-            points_cost = order[5]
-            
-            # Refund points
-            db.update_user_points(user_id, points_cost)
-            db.update_order_status(order_id, 'cancelled')
-            
-            await update.message.reply_text(f"✅ تم إلغاء الطلب #{order_id} واسترداد النقاط")
-            db.log_admin_action(update.effective_user.id, "cancel_order", f"Order #{order_id}")
-            
-            # Notify user
-            await context.bot.send_message(
-                user_id,
-                f"❌ تم إلغاء طلبك #{order_id}\n"
-                f"💎 تم استرداد {Utils.format_number(points_cost)} نقطة"
-            )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم الطلب")
-        except Exception as e:
-            await update.message.reply_text(f"❌ حدث خطأ: {str(e)}")
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process broadcast message"""
-        message = update.message.text
-        
-        # Get all users
-        with Database().db_name as db_name:
-            import sqlite3
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute('SELECT user_id FROM users WHERE is_banned = 0')
-            users = cursor.fetchall()
-            conn.close()
-        
-        sent_count = 0
-        failed_count = 0
-        
-        await update.message.reply_text(f"📤 بدء إرسال الرسالة لـ {len(users)} مستخدم...")
-        
-        for user in users:
-            user_id = user[0]
-            try:
-                await context.bot.send_message(user_id, message)
-                sent_count += 1
-            except Exception:
-                failed_count += 1
-        
-        await update.message.reply_text(
-            f"📊 تم إرسال الرسالة:\n"
-            f"✅ نجح: {sent_count}\n"
-            f"❌ فشل: {failed_count}"
-        )
-        
-        db.log_admin_action(
-            update.effective_user.id, 
-            "broadcast", 
-            f"Sent to {sent_count} users, failed {failed_count}"
-        )
-        
-        context.user_data.pop('admin_waiting_for', None)
-    
-    @staticmethod
-    async def process_send_points_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process send points user selection"""
-        text = update.message.text
-        
-        try:
-            user_id = int(text)
-            user_data = db.get_user(user_id)
-            
-            if not user_data:
-                await update.message.reply_text("❌ المستخدم غير موجود")
-                return
-            
-            context.user_data['target_user_id'] = user_id
-            context.user_data['admin_waiting_for'] = 'send_points_amount'
-            
-            await update.message.reply_text(
-                f"👤 المستخدم: {user_data[2]} (@{user_data[1] or 'N/A'})\n"
-                f"💎 النقاط الحالية: {Utils.format_number(user_data[3])}\n\n"
-                f"أرسل كمية النقاط المراد إرسالها:"
-            )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال معرف المستخدم (رقم)")
-    
-    @staticmethod
-    async def process_send_points_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process send points amount"""
-        text = update.message.text
-        
-        try:
-            points = int(text)
-            user_id = context.user_data.get('target_user_id')
-            
-            if not user_id:
-                await update.message.reply_text("❌ خطأ في بيانات المستخدم")
-                return
-            
-            db.update_user_points(user_id, points)
-            
-            await update.message.reply_text(
-                f"✅ تم إرسال {Utils.format_number(points)} نقطة بنجاح!"
-            )
-            
-            # Notify user
-            await context.bot.send_message(
-                user_id,
-                f"🎉 تم منحك {Utils.format_number(points)} نقطة من الإدارة!\n"
-                f"💎 رصيدك الحالي: {Utils.format_number(db.get_user(user_id)[3])} نقطة"
-            )
-            
-            db.log_admin_action(
-                update.effective_user.id,
-                "send_points",
-                f"Sent {points} points to user {user_id}"
-            )
-        
-        except ValueError:
-            await update.message.reply_text("❌ يرجى إرسال رقم صحيح")
-        
-        context.user_data.pop('admin_waiting_for', None)
-        context.user_data.pop('target_user_id', None)
-    
-    @staticmethod
-    async def list_channels(query, context):
-        """List all channels"""
-        channels = db.get_all_channels()
-        
-        if not channels:
-            await query.edit_message_text("❌ لا توجد قنوات")
-            return
-        
-        text = "📢 قائمة القنوات:\n\n"
-        
-        for channel in channels:
-            channel_id, channel_name, channel_username, points_reward = channel[1], channel[2], channel[3], channel[4]
-            text += f"""
-📢 {channel_name}
-🆔 {channel_id}
-💎 المكافأة: {points_reward} نقطة
-📅 {Utils.format_date(channel[6])}
-────────────────
-            """
-        
-        await query.edit_message_text(text)
-    
-    @staticmethod
-    async def all_orders(query, context):
-        """Show all orders"""
-        orders = db.get_all_orders()
-        
-        if not orders:
-            await query.edit_message_text("❌ لا توجد طلبات")
-            return
-        
-        text = "📋 جميع الطلبات (آخر 20):\n\n"
-        
-        for order in orders[-20:]:
-            order_id, user_id, service_type, target_url, quantity, points_cost, status, created_date, completed_date, username = order
-            text += f"""
-🔸 طلب #{order_id}
-👤 @{username or 'N/A'}
-🚀 {Utils.format_service_name(service_type)}
-📊 {Utils.format_number(quantity)}
-💎 {Utils.format_number(points_cost)} نقطة
-📈 {Utils.format_order_status(status)}
-📅 {Utils.format_date(created_date)}
-────────────────
-            """
-        
-        await query.edit_message_text(text)
-    
-    @staticmethod
-    async def pending_orders(query, context):
-        """Show pending orders"""
-        orders = db.get_all_orders()
-        pending_orders = [o for o in orders if o[6] == 'pending']
-        
-        if not pending_orders:
-            await query.edit_message_text("✅ لا توجد طلبات معلقة")
-            return
-        
-        text = "⏳ الطلبات المعلقة:\n\n"
-        
-        for order in pending_orders:
-            order_id, user_id, service_type, target_url, quantity, points_cost, status, created_date, completed_date, username = order
-            text += f"""
-🔸 طلب #{order_id}
-👤 @{username or 'N/A'}
-🚀 {Utils.format_service_name(service_type)}
-🎯 {target_url}
-📊 {Utils.format_number(quantity)}
-💎 {Utils.format_number(points_cost)} نقطة
-📅 {Utils.format_date(created_date)}
-────────────────
-            """
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=None
+    # Labels of the admin reply keyboard, so typed input can be told apart from button presses
+    MENU_BUTTONS = frozenset(button.text for row in Keyboards.admin_menu().keyboard for button in row)
+    
+    def __init__(self, db):
+        self.db = db
+        self.broadcasts = BroadcastEngine(
+            db,
+            TokenBucket(Config.BROADCAST_RATE, Config.BROADCAST_BURST),
+            concurrency=Config.BROADCAST_CONCURRENCY,
+            batch_size=Config.BROADCAST_BATCH_SIZE,
+            progress_interval=Config.BROADCAST_PROGRESS_INTERVAL,
+            busy_hours=parse_busy_hours(Config.BROADCAST_BUSY_HOURS),
+            busy_rate=Config.BROADCAST_BUSY_RATE,
+            tz=ZoneInfo(Config.TIMEZONE)
         )
-    
-    @staticmethod
-    async def complete_order(query, context, order_id):
-        """Complete specific order"""
-        db.update_order_status(order_id, 'completed')
-        
-        await query.edit_message_text(f"✅ تم إكمال الطلب #{order_id}")
-        db.log_admin_action(query.from_user.id, "complete_order", f"Order #{order_id}")
-        
-        # Get order details to notify user
-        orders = db.get_all_orders()
-        order = next((o for o in orders if o[0] == order_id), None)
-        if order:
-            user_id = order[1]
-            await context.bot.send_message(
-                user_id,
-                f"✅ تم إكمال طلبك #{order_id} بنجاح!\n"
-                f"شكراً لاستخدام البوت 🎉"
-            )
-    
-    @staticmethod
-    async def cancel_order(query, context, order_id):
-        """Cancel specific order"""
-        # Get order details first
-        orders = db.get_all_orders()
-        order = next((o for o in orders if o[0] == order_id), None)
-        
-        if not order:
-            await query.edit_message_text("❌ الطلب غير موجود")
-            return
-        
-        user_id = order[1]
-        points_cost = order[5]
-        
-        # Refund points
-        db.update_user_points(user_id, points_cost)
-        db.update_order_status(order_id, 'cancelled')
-        
-        await query.edit_message_text(f"✅ تم إلغاء الطلب #{order_id} واسترداد النقاط")
-        db.log_admin_action(query.from_user.id, "cancel_order", f"Order #{order_id}")
-        
-        # Notify user
-        await context.bot.send_message(
-            user_id,
-            f"❌ تم إلغاء طلبك #{order_id}\n"
-            f"💎 تم استرداد {Utils.format_number(points_cost)} نقطة"
+        self.notifications = NotificationQueue(
+            db,
+            concurrency=Config.NOTIFICATION_CONCURRENCY,
+            batch_size=Config.NOTIFICATION_BATCH_SIZE,
+            max_retries=Config.NOTIFICATION_MAX_RETRIES
+        )
+        self.outbox = NotificationOutbox(
+            db,
+            self.notifications,
+            batch_size=Config.OUTBOX_BATCH_SIZE,
+            poll_interval=Config.OUTBOX_POLL_INTERVAL,
+            lease=Config.OUTBOX_LEASE,
+            max_attempts=Config.OUTBOX_MAX_ATTEMPTS
         )
     
-    @staticmethod
-    async def admin_menu_callback(query, context):
-        """Show admin menu callback"""
-        stats = db.get_stats()
-        
-        text = f"""
-👑 لوحة تحكم الأدمن
-
-📊 الإحصائيات:
-👥 إجمالي المستخدمين: {Utils.format_number(stats['total_users'])}
-📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
-⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
-        """
-        
-        await query.edit_message_text(text)import logging
-from telegram import Update, ChatMember
-from telegram.ext import ContextTypes
-from database import Database
-from config import Config
-from keyboards import Keyboards
-from utils import Utils
-
-# Initialize database
-db = Database()
-
-class AdminHandlers:
-    @staticmethod
-    async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def admin_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show admin menu"""
         user_id = update.effective_user.id
         
@@ -1273,7 +54,7 @@ class AdminHandlers:
             await update.message.reply_text("❌ غير مصرح لك بالوصول")
             return
         
-        stats = db.get_stats()
+        stats = await self.db.get_stats()
         
         text = f"""
 👑 لوحة تحكم الأدمن
@@ -1290,8 +71,7 @@ class AdminHandlers:
             reply_markup=Keyboards.admin_menu()
         )
     
-    @staticmethod
-    async def handle_admin_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_admin_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle admin text messages"""
         text = update.message.text
         user_id = update.effective_user.id
@@ -1299,26 +79,35 @@ class AdminHandlers:
         if not Utils.is_admin(user_id):
             return
         
+        if text in self.MENU_BUTTONS:
+            # A menu button abandons whatever typed input or schedule was pending
+            context.user_data.pop('admin_waiting_for', None)
+            context.user_data.pop('broadcast_schedule', None)
+        elif context.user_data.get('admin_waiting_for'):
+            await self.handle_admin_input(update, context)
+            return
+        
         if text == "📊 إحصائيات البوت":
-            await AdminHandlers.bot_stats(update, context)
+            await self.bot_stats(update, context)
         elif text == "👥 المستخدمين":
-            await AdminHandlers.users_list(update, context)
+            await self.users_list(update, context)
         elif text == "📢 إدارة القنوات":
-            await AdminHandlers.channels_management(update, context)
+            await self.channels_management(update, context)
         elif text == "📦 إدارة الطلبات":
-            await AdminHandlers.orders_management(update, context)
+            await self.orders_management(update, context)
         elif text == "✉️ رسالة جماعية":
-            await AdminHandlers.broadcast_message(update, context)
+            await self.broadcast_message(update, context)
+        elif text == "⏰ رسالة مجدولة":
+            await self.schedule_broadcast(update, context)
         elif text == "💎 إرسال نقاط":
-            await AdminHandlers.send_points(update, context)
+            await self.send_points(update, context)
         elif text == "🔙 القائمة الرئيسية":
             await update.message.reply_text(
                 "🏠 القائمة الرئيسية",
                 reply_markup=Keyboards.main_menu()
             )
     
-    @staticmethod
-    async def handle_admin_callback(query, context):
+    async def handle_admin_callback(self, query, context):
         """Handle admin callbacks"""
         data = query.data
         user_id = query.from_user.id
@@ -1338,14 +127,14 @@ class AdminHandlers:
             context.user_data['admin_waiting_for'] = 'channel_info'
         
         elif data == "remove_channel":
-            channels = db.get_all_channels()
+            channels = await self.db.get_all_channels()
             if not channels:
                 await query.edit_message_text("❌ لا توجد قنوات لحذفها")
                 return
             
             text = "❌ اختر القناة المراد حذفها:\n\n"
             for i, channel in enumerate(channels):
-                text += f"{i+1}. {channel[2]} (@{channel[3]})\n"
+                text += f"{i+1}. {channel['channel_name']} (@{channel['channel_username']})\n"
             
             text += "\nأرسل رقم القناة:"
             await query.edit_message_text(text)
@@ -1353,13 +142,39 @@ class AdminHandlers:
             context.user_data['channels_list'] = channels
         
         elif data == "list_channels":
-            await AdminHandlers.list_channels(query, context)
+            await self.list_channels(query, context)
         
         elif data == "all_orders":
-            await AdminHandlers.all_orders(query, context)
+            await self.all_orders(query, context)
         
         elif data == "pending_orders":
-            await AdminHandlers.pending_orders(query, context)
+            await self.pending_orders(query, context)
+        
+        elif data.startswith("orders_page_"):
+            # orders_page_<view>_<older|newer>_<order_id>
+            view, direction, cursor = data.replace("orders_page_", "").split("_")
+            cursor = int(cursor)
+            show_page = self.pending_orders if view == "pending" else self.all_orders
+            if direction == "older":
+                await show_page(query, context, before_id=cursor)
+            else:
+                await show_page(query, context, after_id=cursor)
+        
+        elif data.startswith("broadcast_segment_"):
+            await self.select_broadcast_segment(query, context, data.replace("broadcast_segment_", ""))
+        
+        elif data.startswith("broadcast_cancel_"):
+            broadcast_id = int(data.replace("broadcast_cancel_", ""))
+            if self.broadcasts.cancel(broadcast_id):
+                await self.db.log_admin_action(user_id, "broadcast_cancel", f"Broadcast #{broadcast_id}")
+        
+        elif data.startswith("broadcast_unschedule_"):
+            broadcast_id = int(data.replace("broadcast_unschedule_", ""))
+            if await self.broadcasts.unschedule(context.job_queue, broadcast_id):
+                await self.db.log_admin_action(user_id, "broadcast_unschedule", f"Broadcast #{broadcast_id}")
+                await query.edit_message_text(f"🗑 تم إلغاء الرسالة المجدولة #{broadcast_id}")
+            else:
+                await query.edit_message_text(f"❌ الرسالة #{broadcast_id} بدأت أو أُلغيت مسبقاً")
         
         elif data == "complete_order":
             await query.edit_message_text(
@@ -1377,17 +192,16 @@ class AdminHandlers:
         
         elif data.startswith("admin_complete_"):
             order_id = int(data.replace("admin_complete_", ""))
-            await AdminHandlers.complete_order(query, context, order_id)
+            await self.complete_order(query, context, order_id)
         
         elif data.startswith("admin_cancel_"):
             order_id = int(data.replace("admin_cancel_", ""))
-            await AdminHandlers.cancel_order(query, context, order_id)
+            await self.cancel_order(query, context, order_id)
         
         elif data == "back_to_admin":
-            await AdminHandlers.admin_menu_callback(query, context)
+            await self.admin_menu_callback(query, context)
     
-    @staticmethod
-    async def handle_admin_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_admin_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle admin input"""
         text = update.message.text
         user_id = update.effective_user.id
@@ -1398,24 +212,27 @@ class AdminHandlers:
         waiting_for = context.user_data.get('admin_waiting_for')
         
         if waiting_for == 'channel_info':
-            await AdminHandlers.process_channel_info(update, context)
+            await self.process_channel_info(update, context)
         elif waiting_for == 'remove_channel':
-            await AdminHandlers.process_remove_channel(update, context)
+            await self.process_remove_channel(update, context)
         elif waiting_for == 'complete_order':
-            await AdminHandlers.process_complete_order(update, context)
+            await self.process_complete_order(update, context)
         elif waiting_for == 'cancel_order':
-            await AdminHandlers.process_cancel_order(update, context)
+            await self.process_cancel_order(update, context)
+        elif waiting_for == 'broadcast_schedule':
+            await self.process_broadcast_schedule(update, context)
+        elif waiting_for == 'broadcast_segment':
+            await self.process_broadcast_segment(update, context)
         elif waiting_for == 'broadcast_message':
-            await AdminHandlers.process_broadcast(update, context)
+            await self.process_broadcast(update, context)
         elif waiting_for == 'send_points_user':
-            await AdminHandlers.process_send_points_user(update, context)
+            await self.process_send_points_user(update, context)
         elif waiting_for == 'send_points_amount':
-            await AdminHandlers.process_send_points_amount(update, context)
+            await self.process_send_points_amount(update, context)
     
-    @staticmethod
-    async def bot_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def bot_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show bot statistics"""
-        stats = db.get_stats()
+        stats = await self.db.get_stats()
         
         text = f"""
 📊 إحصائيات البوت المفصلة:
@@ -1423,28 +240,53 @@ class AdminHandlers:
 👥 المستخدمين: {Utils.format_number(stats['total_users'])}
 📋 إجمالي الطلبات: {Utils.format_number(stats['total_orders'])}
 ⏳ الطلبات المعلقة: {Utils.format_number(stats['pending_orders'])}
-✅ الطلبات المكتملة: {Utils.format_number(stats['total_orders'] - stats['pending_orders'])}
+✅ الطلبات المكتملة: {Utils.format_number(stats['completed_orders'])}
+❌ الطلبات الملغية: {Utils.format_number(stats['cancelled_orders'])}
+💰 النقاط المتداولة: {Utils.format_number(stats['total_points'])}
 📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
         """
         
+        pool_stats = await self.db.get_pool_stats()
+        if pool_stats:
+            text += f"""
+🔌 اتصالات قاعدة البيانات:
+• المستخدمة: {pool_stats['in_use']} / {pool_stats['max_size']}
+• الخاملة: {pool_stats['idle']}
+• مرات الانتظار: {Utils.format_number(pool_stats['waits'])}
+• مهلات منتهية: {Utils.format_number(pool_stats['timeouts'])}
+• متوسط الانتظار: {pool_stats['avg_wait_ms']} ms
+            """
+        
+        cache_stats = await self.db.get_cache_stats()
+        text += f"""
+🧠 ذاكرة المستخدمين المؤقتة:
+• العناصر: {Utils.format_number(cache_stats['size'])} / {Utils.format_number(cache_stats['maxsize'])}
+• نسبة الإصابة: {cache_stats['hit_rate']}%
+• إصابات / إخفاقات: {Utils.format_number(cache_stats['hits'])} / {Utils.format_number(cache_stats['misses'])}
+        """
+        
+        notification_stats = self.notifications.stats()
+        text += f"""
+🔔 إشعارات المستخدمين:
+• في الانتظار: {Utils.format_number(notification_stats['queued'])}
+• أُرسلت: {Utils.format_number(notification_stats['sent'])}
+• فشلت: {Utils.format_number(notification_stats['failed'])}
+• إعادة محاولة: {Utils.format_number(notification_stats['retried'])}
+• في صندوق الصادر: {Utils.format_number(await self.db.count_pending_outbox())}
+        """
+        
         await update.message.reply_text(text)
     
-    @staticmethod
-    async def users_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def reconcile_stats(self, context: ContextTypes.DEFAULT_TYPE):
+        """Periodic job: correct any drift in the statistics counters"""
+        drift = await self.db.reconcile_counters()
+        if drift:
+            logger.warning(f"Statistics counters drifted and were corrected: {drift}")
+    
+    async def users_list(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show users list"""
         # Get recent users (last 20)
-        with Database().db_name as db_name:
-            import sqlite3
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT user_id, username, first_name, points, referrals, joined_date 
-                FROM users 
-                ORDER BY joined_date DESC 
-                LIMIT 20
-            ''')
-            users = cursor.fetchall()
-            conn.close()
+        users = await self.db.get_recent_users(20)
         
         if not users:
             await update.message.reply_text("❌ لا توجد مستخدمين")
@@ -1453,45 +295,134 @@ class AdminHandlers:
         text = "👥 آخر المستخدمين:\n\n"
         
         for user in users:
-            user_id, username, first_name, points, referrals, joined_date = user
             text += f"""
-👤 {first_name} (@{username or 'N/A'})
-🆔 {user_id}
-💎 النقاط: {Utils.format_number(points)}
-👥 الإحالات: {referrals}
-📅 {Utils.format_date(joined_date)}
+👤 {user['first_name']} (@{user['username'] or 'N/A'})
+🆔 {user['user_id']}
+💎 النقاط: {Utils.format_number(user['points'])}
+👥 الإحالات: {user['referrals']}
+📅 {Utils.format_date(user['joined_date'])}
 ────────────────
             """
         
         await update.message.reply_text(text)
     
-    @staticmethod
-    async def channels_management(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def channels_management(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show channels management"""
         await update.message.reply_text(
             "📢 إدارة القنوات",
             reply_markup=Keyboards.admin_channels_keyboard()
         )
     
-    @staticmethod
-    async def orders_management(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def orders_management(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show orders management"""
         await update.message.reply_text(
             "📦 إدارة الطلبات",
             reply_markup=Keyboards.admin_orders_keyboard()
         )
     
-    @staticmethod
-    async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Broadcast message to all users"""
+    async def broadcast_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Broadcast message: choose the target segment first"""
+        context.user_data.pop('broadcast_segment', None)
+        context.user_data.pop('broadcast_schedule', None)
         await update.message.reply_text(
             "✉️ إرسال رسالة جماعية\n\n"
-            "أرسل الرسالة التي تريد إرسالها لجميع المستخدمين:"
+            "اختر الفئة المستهدفة:",
+            reply_markup=Keyboards.broadcast_segments_keyboard()
+        )
+    
+    async def schedule_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Scheduled broadcast: ask for the send time and list pending ones"""
+        context.user_data.pop('broadcast_segment', None)
+        context.user_data.pop('broadcast_schedule', None)
+        
+        jobs = await self.db.get_scheduled_broadcast_jobs()
+        text = "⏰ رسالة مجدولة\n\n"
+        if jobs:
+            text += "📋 الرسائل المجدولة:\n"
+            for job in jobs:
+                run_at = self.broadcasts.scheduled_time(job).astimezone(self.broadcasts.tz)
+                text += f"#{job['job_id']} - {run_at:%Y-%m-%d %H:%M}\n"
+            text += "\n"
+        text += (
+            f"أرسل موعد الإرسال ({Config.TIMEZONE}) بالتنسيق:\n"
+            "2024-06-30 21:00\n\n"
+            "أضف slow في النهاية لإبطاء الإرسال في أوقات الذروة"
+        )
+        
+        await update.message.reply_text(
+            text,
+            reply_markup=Keyboards.scheduled_broadcasts_keyboard([job['job_id'] for job in jobs])
+        )
+        context.user_data['admin_waiting_for'] = 'broadcast_schedule'
+    
+    async def process_broadcast_schedule(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Process the send time of a scheduled broadcast"""
+        try:
+            run_at, throttle = parse_schedule(update.message.text, self.broadcasts.tz)
+        except ValueError:
+            await update.message.reply_text("❌ تنسيق غير صحيح، مثال: 2024-06-30 21:00")
+            return
+        
+        if run_at <= datetime.now(timezone.utc):
+            await update.message.reply_text("❌ يجب أن يكون الموعد في المستقبل")
+            return
+        
+        context.user_data['broadcast_schedule'] = {'run_at': run_at, 'throttle': throttle}
+        context.user_data.pop('admin_waiting_for', None)
+        await update.message.reply_text(
+            "اختر الفئة المستهدفة:",
+            reply_markup=Keyboards.broadcast_segments_keyboard()
         )
+    
+    async def select_broadcast_segment(self, query, context, key):
+        """Apply a preset segment, or ask for a custom one"""
+        if key == 'custom':
+            await query.edit_message_text(
+                "⚙️ فئة مخصصة\n\n"
+                "أرسل الشروط في سطر واحد، مثال:\n"
+                "active=7 points=100+ ordered=yes\n\n"
+                f"{SEGMENT_FORMAT_HELP}"
+            )
+            context.user_data['admin_waiting_for'] = 'broadcast_segment'
+            return
+        
+        if key not in BROADCAST_SEGMENTS:
+            return
+        await query.edit_message_text(await self.broadcast_prompt(context, BROADCAST_SEGMENTS[key]))
+    
+    async def process_broadcast_segment(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Process a custom broadcast segment"""
+        try:
+            segment = parse_segment(update.message.text)
+        except ValueError:
+            await update.message.reply_text(f"❌ تنسيق غير صحيح\n\n{SEGMENT_FORMAT_HELP}")
+            return
+        
+        # Keep asking rather than collect a message nobody would receive
+        if not await self.db.count_broadcast_recipients(segment):
+            await update.message.reply_text(
+                f"❌ لا يوجد مستخدمون ضمن الفئة: {describe_segment(segment)}\n\n"
+                "أرسل شروطاً أخرى:"
+            )
+            return
+        await update.message.reply_text(await self.broadcast_prompt(context, segment))
+    
+    async def broadcast_prompt(self, context, segment):
+        """Remember the chosen segment and ask for the message to send"""
+        context.user_data['broadcast_segment'] = segment
         context.user_data['admin_waiting_for'] = 'broadcast_message'
+        count = await self.db.count_broadcast_recipients(segment)
+        text = (
+            f"🎯 الفئة: {describe_segment(segment)}\n"
+            f"👥 عدد المستهدفين: {Utils.format_number(count)}\n"
+        )
+        schedule = context.user_data.get('broadcast_schedule')
+        if schedule:
+            run_at = schedule['run_at'].astimezone(self.broadcasts.tz)
+            text += f"📅 الموعد: {run_at:%Y-%m-%d %H:%M} ({Config.TIMEZONE})\n"
+        return text + "\nأرسل الرسالة التي تريد إرسالها (نص أو صورة أو فيديو أو ملف):"
     
-    @staticmethod
-    async def send_points(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def send_points(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send points to user"""
         await update.message.reply_text(
             "💎 إرسال نقاط\n\n"
@@ -1499,8 +430,7 @@ class AdminHandlers:
         )
         context.user_data['admin_waiting_for'] = 'send_points_user'
     
-    @staticmethod
-    async def process_channel_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def process_channel_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process channel information"""
         text = update.message.text
         
@@ -1517,14 +447,14 @@ class AdminHandlers:
             # Remove @ if present
             channel_username = channel_id.replace('@', '') if channel_id.startswith('@') else None
             
-            if db.add_channel(channel_id, channel_name, channel_username, points_reward):
+            if await self.db.add_channel(channel_id, channel_name, channel_username, points_reward):
                 await update.message.reply_text(
                     f"✅ تم إضافة القناة بنجاح!\n\n"
                     f"📢 القناة: {channel_name}\n"
                     f"🆔 المعرف: {channel_id}\n"
                     f"💎 المكافأة: {points_reward} نقطة"
                 )
-                db.log_admin_action(update.effective_user.id, "add_channel", f"{channel_name} - {channel_id}")
+                await self.db.log_admin_action(update.effective_user.id, "add_channel", f"{channel_name} - {channel_id}")
             else:
                 await update.message.reply_text("❌ القناة موجودة مسبقاً")
         
@@ -1535,8 +465,7 @@ class AdminHandlers:
         
         context.user_data.pop('admin_waiting_for', None)
     
-    @staticmethod
-    async def process_remove_channel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def process_remove_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process channel removal"""
         text = update.message.text
         
@@ -1546,12 +475,12 @@ class AdminHandlers:
             
             if 0 <= channel_index < len(channels):
                 channel = channels[channel_index]
-                channel_id = channel[1]
-                channel_name = channel[2]
+                channel_id = channel['channel_id']
+                channel_name = channel['channel_name']
                 
-                if db.remove_channel(channel_id):
+                if await self.db.remove_channel(channel_id):
                     await update.message.reply_text(f"✅ تم حذف القناة: {channel_name}")
-                    db.log_admin_action(update.effective_user.id, "remove_channel", f"{channel_name} - {channel_id}")
+                    await self.db.log_admin_action(update.effective_user.id, "remove_channel", f"{channel_name} - {channel_id}")
                 else:
                     await update.message.reply_text("❌ فشل في حذف القناة")
             else:
@@ -1563,29 +492,24 @@ class AdminHandlers:
         context.user_data.pop('admin_waiting_for', None)
         context.user_data.pop('channels_list', None)
     
-    @staticmethod
-    async def process_complete_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def process_complete_order(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process order completion"""
         text = update.message.text
         
         try:
             order_id = int(text)
-            db.update_order_status(order_id, 'completed')
+            # The user's notification is queued in the outbox in the same transaction
+            order = await self.db.update_order_status_returning(
+                order_id, 'completed', notify=self.order_notification_text
+            )
             
-            await update.message.reply_text(f"✅ تم إكمال الطلب #{order_id}")
-            db.log_admin_action(update.effective_user.id, "complete_order", f"Order #{order_id}")
+            if not order:
+                await update.message.reply_text(await self.order_not_updated_text(order_id))
+                return
             
-            # Notify user
-            # Get order details to notify user
-            orders = db.get_all_orders()
-            order = next((o for o in orders if o[0] == order_id), None)
-            if order:
-                user_id = order[1]
-                await context.bot.send_message(
-                    user_id,
-                    f"✅ تم إكمال طلبك #{order_id} بنجاح!\n"
-                    f"شكراً لاستخدام البوت 🎉"
-                )
+            self.outbox.wake()
+            await update.message.reply_text(f"✅ تم إكمال الطلب #{order_id}")
+            await self.db.log_admin_action(update.effective_user.id, "complete_order", f"Order #{order_id}")
         
         except ValueError:
             await update.message.reply_text("❌ يرجى إرسال رقم الطلب")
@@ -1594,38 +518,25 @@ class AdminHandlers:
         
         context.user_data.pop('admin_waiting_for', None)
     
-    @staticmethod
-    async def process_cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def process_cancel_order(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process order cancellation"""
         text = update.message.text
         
         try:
             order_id = int(text)
             
-            # Get order details first
-            orders = db.get_all_orders()
-            order = next((o for o in orders if o[0] == order_id), None)
+            # Cancel, refund and queue the user's notification in one transaction
+            order = await self.db.update_order_status_returning(
+                order_id, 'cancelled', refund=True, notify=self.order_notification_text
+            )
             
             if not order:
-                await update.message.reply_text("❌ الطلب غير موجود")
+                await update.message.reply_text(await self.order_not_updated_text(order_id))
                 return
             
-            user_id = order[1]
-            points_cost = order[5]
-            
-            # Refund points
-            db.update_user_points(user_id, points_cost)
-            db.update_order_status(order_id, 'cancelled')
-            
+            self.outbox.wake()
             await update.message.reply_text(f"✅ تم إلغاء الطلب #{order_id} واسترداد النقاط")
-            db.log_admin_action(update.effective_user.id, "cancel_order", f"Order #{order_id}")
-            
-            # Notify user
-            await context.bot.send_message(
-                user_id,
-                f"❌ تم إلغاء طلبك #{order_id}\n"
-                f"💎 تم استرداد {Utils.format_number(points_cost)} نقطة"
-            )
+            await self.db.log_admin_action(update.effective_user.id, "cancel_order", f"Order #{order_id}")
         
         except ValueError:
             await update.message.reply_text("❌ يرجى إرسال رقم الطلب")
@@ -1634,55 +545,47 @@ class AdminHandlers:
         
         context.user_data.pop('admin_waiting_for', None)
     
-    @staticmethod
-    async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Process broadcast message"""
-        message = update.message.text
-        
-        # Get all users
-        with Database().db_name as db_name:
-            import sqlite3
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute('SELECT user_id FROM users WHERE is_banned = 0')
-            users = cursor.fetchall()
-            conn.close()
-        
-        sent_count = 0
-        failed_count = 0
-        
-        await update.message.reply_text(f"📤 بدء إرسال الرسالة لـ {len(users)} مستخدم...")
-        
-        for user in users:
-            user_id = user[0]
-            try:
-                await context.bot.send_message(user_id, message)
-                sent_count += 1
-            except Exception:
-                failed_count += 1
+    async def process_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Start a background broadcast of the admin's message, photo, video or file"""
+        context.user_data.pop('admin_waiting_for', None)
+        segment = context.user_data.pop('broadcast_segment', None)
+        message = update.message
+        media = message_media(message)
+        text = message.caption if media else message.text
+        
+        schedule = context.user_data.pop('broadcast_schedule', None)
+        if not schedule:
+            await self.broadcasts.start(context.bot, update.effective_user.id, text or "", segment, media)
+            return
         
-        await update.message.reply_text(
-            f"📊 تم إرسال الرسالة:\n"
-            f"✅ نجح: {sent_count}\n"
-            f"❌ فشل: {failed_count}"
+        job_id = await self.broadcasts.schedule(
+            context.job_queue, update.effective_user.id, text or "", schedule['run_at'],
+            segment, media, schedule['throttle']
         )
-        
-        db.log_admin_action(
-            update.effective_user.id, 
-            "broadcast", 
-            f"Sent to {sent_count} users, failed {failed_count}"
+        run_at = schedule['run_at'].astimezone(self.broadcasts.tz)
+        await message.reply_text(
+            f"⏰ تمت جدولة الرسالة #{job_id}\n\n"
+            f"📅 الموعد: {run_at:%Y-%m-%d %H:%M} ({Config.TIMEZONE})\n"
+            f"🎯 الفئة: {describe_segment(segment)}"
+            + ("\n🐢 إبطاء في أوقات الذروة" if schedule['throttle'] else ""),
+            reply_markup=Keyboards.scheduled_broadcasts_keyboard([job_id])
         )
+    
+    async def handle_admin_media(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle photos, videos and files sent by the admin"""
+        if not Utils.is_admin(update.effective_user.id):
+            return
         
-        context.user_data.pop('admin_waiting_for', None)
+        if context.user_data.get('admin_waiting_for') == 'broadcast_message':
+            await self.process_broadcast(update, context)
     
-    @staticmethod
-    async def process_send_points_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def process_send_points_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process send points user selection"""
         text = update.message.text
         
         try:
             user_id = int(text)
-            user_data = db.get_user(user_id)
+            user_data = await self.db.get_user(user_id)
             
             if not user_data:
                 await update.message.reply_text("❌ المستخدم غير موجود")
@@ -1692,16 +595,15 @@ class AdminHandlers:
             context.user_data['admin_waiting_for'] = 'send_points_amount'
             
             await update.message.reply_text(
-                f"👤 المستخدم: {user_data[2]} (@{user_data[1] or 'N/A'})\n"
-                f"💎 النقاط الحالية: {Utils.format_number(user_data[3])}\n\n"
+                f"👤 المستخدم: {user_data['first_name']} (@{user_data['username'] or 'N/A'})\n"
+                f"💎 النقاط الحالية: {Utils.format_number(user_data['points'])}\n\n"
                 f"أرسل كمية النقاط المراد إرسالها:"
             )
         
         except ValueError:
             await update.message.reply_text("❌ يرجى إرسال معرف المستخدم (رقم)")
     
-    @staticmethod
-    async def process_send_points_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def process_send_points_amount(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process send points amount"""
         text = update.message.text
         
@@ -1713,24 +615,27 @@ class AdminHandlers:
                 await update.message.reply_text("❌ خطأ في بيانات المستخدم")
                 return
             
-            db.update_user_points(user_id, points)
-            
-            await update.message.reply_text(
-                f"✅ تم إرسال {Utils.format_number(points)} نقطة بنجاح!"
-            )
-            
-            # Notify user
-            await context.bot.send_message(
-                user_id,
-                f"🎉 تم منحك {Utils.format_number(points)} نقطة من الإدارة!\n"
-                f"💎 رصيدك الحالي: {Utils.format_number(db.get_user(user_id)[3])} نقطة"
-            )
-            
-            db.log_admin_action(
-                update.effective_user.id,
-                "send_points",
-                f"Sent {points} points to user {user_id}"
-            )
+            if not await self.db.update_user_points(user_id, points):
+                await update.message.reply_text("❌ المستخدم غير موجود")
+            else:
+                await update.message.reply_text(
+                    f"✅ تم إرسال {Utils.format_number(points)} نقطة بنجاح!"
+                )
+                
+                # Notify user in the background
+                user_data = await self.db.get_user(user_id)
+                if user_data:
+                    self.notifications.enqueue(
+                        user_id,
+                        f"🎉 تم منحك {Utils.format_number(points)} نقطة من الإدارة!\n"
+                        f"💎 رصيدك الحالي: {Utils.format_number(user_data['points'])} نقطة"
+                    )
+                
+                await self.db.log_admin_action(
+                    update.effective_user.id,
+                    "send_points",
+                    f"Sent {points} points to user {user_id}"
+                )
         
         except ValueError:
             await update.message.reply_text("❌ يرجى إرسال رقم صحيح")
@@ -1738,10 +643,9 @@ class AdminHandlers:
         context.user_data.pop('admin_waiting_for', None)
         context.user_data.pop('target_user_id', None)
     
-    @staticmethod
-    async def list_channels(query, context):
+    async def list_channels(self, query, context):
         """List all channels"""
-        channels = db.get_all_channels()
+        channels = await self.db.get_all_channels()
         
         if not channels:
             await query.edit_message_text("❌ لا توجد قنوات")
@@ -1750,48 +654,52 @@ class AdminHandlers:
         text = "📢 قائمة القنوات:\n\n"
         
         for channel in channels:
-            channel_id, channel_name, channel_username, points_reward = channel[1], channel[2], channel[3], channel[4]
             text += f"""
-📢 {channel_name}
-🆔 {channel_id}
-💎 المكافأة: {points_reward} نقطة
-📅 {Utils.format_date(channel[6])}
+📢 {channel['channel_name']}
+🆔 {channel['channel_id']}
+💎 المكافأة: {channel['points_reward']} نقطة
+📅 {Utils.format_date(channel['added_date'])}
 ────────────────
             """
         
         await query.edit_message_text(text)
     
-    @staticmethod
-    async def all_orders(query, context):
+    async def all_orders(self, query, context, before_id=None, after_id=None):
         """Show all orders"""
-        orders = db.get_all_orders()
+        page = await self.db.get_orders_page(
+            before_id=before_id, after_id=after_id, limit=Config.ADMIN_ORDERS_PAGE_SIZE
+        )
+        orders = page['orders']
         
         if not orders:
             await query.edit_message_text("❌ لا توجد طلبات")
             return
         
-        text = "📋 جميع الطلبات (آخر 20):\n\n"
+        text = "📋 جميع الطلبات:\n\n"
         
-        for order in orders[-20:]:
-            order_id, user_id, service_type, target_url, quantity, points_cost, status, created_date, completed_date, username = order
+        for order in orders:
             text += f"""
-🔸 طلب #{order_id}
-👤 @{username or 'N/A'}
-🚀 {Utils.format_service_name(service_type)}
-📊 {Utils.format_number(quantity)}
-💎 {Utils.format_number(points_cost)} نقطة
-📈 {Utils.format_order_status(status)}
-📅 {Utils.format_date(created_date)}
+🔸 طلب #{order['order_id']}
+👤 @{order['username'] or 'N/A'}
+🚀 {Utils.format_service_name(order['service_type'])}
+📊 {Utils.format_number(order['quantity'])}
+💎 {Utils.format_number(order['points_cost'])} نقطة
+📈 {Utils.format_order_status(order['status'])}
+📅 {Utils.format_date(order['created_date'])}
 ────────────────
             """
         
-        await query.edit_message_text(text)
+        await query.edit_message_text(
+            text,
+            reply_markup=Keyboards.orders_page_keyboard('all', page)
+        )
     
-    @staticmethod
-    async def pending_orders(query, context):
+    async def pending_orders(self, query, context, before_id=None, after_id=None):
         """Show pending orders"""
-        orders = db.get_all_orders()
-        pending_orders = [o for o in orders if o[6] == 'pending']
+        page = await self.db.get_orders_page(
+            status='pending', before_id=before_id, after_id=after_id, limit=Config.ADMIN_ORDERS_PAGE_SIZE
+        )
+        pending_orders = page['orders']
         
         if not pending_orders:
             await query.edit_message_text("✅ لا توجد طلبات معلقة")
@@ -1800,74 +708,75 @@ class AdminHandlers:
         text = "⏳ الطلبات المعلقة:\n\n"
         
         for order in pending_orders:
-            order_id, user_id, service_type, target_url, quantity, points_cost, status, created_date, completed_date, username = order
             text += f"""
-🔸 طلب #{order_id}
-👤 @{username or 'N/A'}
-🚀 {Utils.format_service_name(service_type)}
-🎯 {target_url}
-📊 {Utils.format_number(quantity)}
-💎 {Utils.format_number(points_cost)} نقطة
-📅 {Utils.format_date(created_date)}
+🔸 طلب #{order['order_id']}
+👤 @{order['username'] or 'N/A'}
+🚀 {Utils.format_service_name(order['service_type'])}
+🎯 {order['target_url']}
+📊 {Utils.format_number(order['quantity'])}
+💎 {Utils.format_number(order['points_cost'])} نقطة
+📅 {Utils.format_date(order['created_date'])}
 ────────────────
             """
         
         await query.edit_message_text(
             text,
-            reply_markup=None
+            reply_markup=Keyboards.orders_page_keyboard('pending', page)
         )
     
-    @staticmethod
-    async def complete_order(query, context, order_id):
+    async def complete_order(self, query, context, order_id):
         """Complete specific order"""
-        db.update_order_status(order_id, 'completed')
+        # The user's notification is queued in the outbox in the same transaction
+        order = await self.db.update_order_status_returning(
+            order_id, 'completed', notify=self.order_notification_text
+        )
+        
+        if not order:
+            await query.edit_message_text(await self.order_not_updated_text(order_id))
+            return
         
+        self.outbox.wake()
         await query.edit_message_text(f"✅ تم إكمال الطلب #{order_id}")
-        db.log_admin_action(query.from_user.id, "complete_order", f"Order #{order_id}")
-        
-        # Get order details to notify user
-        orders = db.get_all_orders()
-        order = next((o for o in orders if o[0] == order_id), None)
-        if order:
-            user_id = order[1]
-            await context.bot.send_message(
-                user_id,
-                f"✅ تم إكمال طلبك #{order_id} بنجاح!\n"
-                f"شكراً لاستخدام البوت 🎉"
-            )
+        await self.db.log_admin_action(query.from_user.id, "complete_order", f"Order #{order_id}")
     
-    @staticmethod
-    async def cancel_order(query, context, order_id):
+    async def cancel_order(self, query, context, order_id):
         """Cancel specific order"""
-        # Get order details first
-        orders = db.get_all_orders()
-        order = next((o for o in orders if o[0] == order_id), None)
+        # Cancel, refund and queue the user's notification in one transaction
+        order = await self.db.update_order_status_returning(
+            order_id, 'cancelled', refund=True, notify=self.order_notification_text
+        )
         
         if not order:
-            await query.edit_message_text("❌ الطلب غير موجود")
+            await query.edit_message_text(await self.order_not_updated_text(order_id))
             return
         
-        user_id = order[1]
-        points_cost = order[5]
-        
-        # Refund points
-        db.update_user_points(user_id, points_cost)
-        db.update_order_status(order_id, 'cancelled')
-        
+        self.outbox.wake()
         await query.edit_message_text(f"✅ تم إلغاء الطلب #{order_id} واسترداد النقاط")
-        db.log_admin_action(query.from_user.id, "cancel_order", f"Order #{order_id}")
-        
-        # Notify user
-        await context.bot.send_message(
-            user_id,
-            f"❌ تم إلغاء طلبك #{order_id}\n"
-            f"💎 تم استرداد {Utils.format_number(points_cost)} نقطة"
-        )
+        await self.db.log_admin_action(query.from_user.id, "cancel_order", f"Order #{order_id}")
     
     @staticmethod
-    async def admin_menu_callback(query, context):
+    def order_notification_text(order):
+        """Message telling a user their order was completed or cancelled"""
+        if order['status'] == 'completed':
+            return (
+                f"✅ تم إكمال طلبك #{order['order_id']} بنجاح!\n"
+                f"شكراً لاستخدام البوت 🎉"
+            )
+        return (
+            f"❌ تم إلغاء طلبك #{order['order_id']}\n"
+            f"💎 تم استرداد {Utils.format_number(order['points_cost'])} نقطة"
+        )
+    
+    async def order_not_updated_text(self, order_id):
+        """Explain why a pending-order transition did not apply"""
+        order = await self.db.get_order(order_id)
+        if not order:
+            return "❌ الطلب غير موجود"
+        return f"⚠️ لا يمكن تعديل الطلب #{order_id}، حالته الحالية: {Utils.format_order_status(order['status'])}"
+    
+    async def admin_menu_callback(self, query, context):
         """Show admin menu callback"""
-        stats = db.get_stats()
+        stats = await self.db.get_stats()
         
         text = f"""
 👑 لوحة تحكم الأدمن
@@ -1879,4 +788,4 @@ class AdminHandlers:
 📢 القنوات النشطة: {Utils.format_number(stats['total_channels'])}
         """
         
-        await query.edit_message_text(text)
\ No newline at end of file
+        await query.edit_message_text(text)
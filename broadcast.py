@@ -0,0 +1,524 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from keyboards import Keyboards
+from rate_limiter import PRIORITY_BULK, TokenBucket
+from utils import Utils
+
+logger = logging.getLogger(__name__)
+
+
+# Segments offered as buttons; "custom" segments are typed by the admin
+BROADCAST_SEGMENTS = {
+    'all': {},
+    'active7': {'active_days': 7},
+    'active30': {'active_days': 30},
+    'ordered': {'has_ordered': True},
+    'points100': {'min_points': 100},
+}
+
+SEGMENT_FORMAT_HELP = (
+    "active=7 ← نشطون خلال آخر 7 أيام\n"
+    "points=100-500 ← رصيد بين 100 و 500 (أو points=100+)\n"
+    "joined=2024-01-01..2024-06-30 ← تاريخ الانضمام\n"
+    "ordered=yes ← لديهم طلبات (أو no)"
+)
+
+
+def parse_segment(text):
+    """Parse a custom segment such as "active=7 points=100-500 ordered=yes".
+    
+    Raises ValueError on anything it does not understand.
+    """
+    segment = {}
+    for part in text.split():
+        key, sep, value = part.partition('=')
+        key, value = key.strip().lower(), value.strip()
+        if not sep or not value:
+            raise ValueError(part)
+        
+        if key == 'active':
+            segment['active_days'] = int(value)
+        elif key == 'points':
+            if value.endswith('+'):
+                segment['min_points'] = int(value[:-1])
+            else:
+                low, _, high = value.partition('-')
+                if low:
+                    segment['min_points'] = int(low)
+                if high:
+                    segment['max_points'] = int(high)
+        elif key == 'joined':
+            start, _, end = value.partition('..')
+            for name, date in (('joined_from', start), ('joined_to', end)):
+                if date:
+                    datetime.strptime(date, '%Y-%m-%d')
+                    segment[name] = date
+        elif key == 'ordered':
+            if value.lower() not in ('yes', 'no'):
+                raise ValueError(part)
+            segment['has_ordered'] = value.lower() == 'yes'
+        else:
+            raise ValueError(part)
+    
+    if not segment:
+        raise ValueError(text)
+    return segment
+
+
+def describe_segment(segment):
+    """Human readable summary of a segment for the admin"""
+    if not segment:
+        return "جميع المستخدمين"
+    
+    parts = []
+    if segment.get('active_days'):
+        parts.append(f"نشطون خلال آخر {segment['active_days']} يوم")
+    if segment.get('min_points') is not None or segment.get('max_points') is not None:
+        parts.append(f"الرصيد {segment.get('min_points', 0)} - {segment.get('max_points', '∞')}")
+    if segment.get('joined_from') or segment.get('joined_to'):
+        parts.append(f"انضموا {segment.get('joined_from', '…')} → {segment.get('joined_to', '…')}")
+    if segment.get('has_ordered') is not None:
+        parts.append("لديهم طلبات" if segment['has_ordered'] else "بدون طلبات")
+    return "، ".join(parts)
+
+
+# Bot method used to send each kind of broadcast media
+MEDIA_SENDERS = {
+    'photo': 'send_photo',
+    'video': 'send_video',
+    'document': 'send_document',
+}
+
+MEDIA_NAMES = {
+    'photo': "صورة",
+    'video': "فيديو",
+    'document': "ملف",
+}
+
+
+def parse_busy_hours(text):
+    """Parse "18-23" into (18, 23); an empty setting means no busy hours"""
+    if not text or not text.strip():
+        return None
+    start, _, end = text.partition('-')
+    start, end = int(start), int(end)
+    if not (0 <= start <= 23 and 0 <= end <= 24):
+        raise ValueError(text)
+    return start, end
+
+
+def parse_schedule(text, tz):
+    """Parse "2024-06-30 21:00 [slow]" in timezone tz.
+    
+    Returns (run_at as an aware UTC datetime, throttle). Raises ValueError.
+    """
+    parts = text.split()
+    throttle = len(parts) == 3 and parts[2].lower() == 'slow'
+    if len(parts) != 2 and not throttle:
+        raise ValueError(text)
+    local = datetime.strptime(f"{parts[0]} {parts[1]}", '%Y-%m-%d %H:%M').replace(tzinfo=tz)
+    return local.astimezone(timezone.utc), throttle
+
+
+def message_media(message):
+    """Return (media_type, file_id, file_unique_id) for a broadcastable message, or None"""
+    if message.photo:
+        media = message.photo[-1]  # largest size
+        return 'photo', media.file_id, media.file_unique_id
+    if message.video:
+        return 'video', message.video.file_id, message.video.file_unique_id
+    if message.document:
+        return 'document', message.document.file_id, message.document.file_unique_id
+    return None
+
+
+def unreachable_reason(error):
+    """Classify a send error that means the user can never be reached again"""
+    message = str(error).lower()
+    if isinstance(error, Forbidden):
+        return 'deactivated' if 'deactivated' in message else 'blocked'
+    if isinstance(error, BadRequest) and 'chat not found' in message:
+        return 'not_found'
+    return None
+
+
+class Broadcast:
+    """Live state of one broadcast job.
+    
+    ``cursor`` is the highest user_id such that every recipient up to it has
+    been handled. Workers finish out of order, so it only advances over a
+    contiguous run of completed sends; that is what gets checkpointed.
+    """
+    
+    def __init__(self, broadcast_id, admin_id, text, total, cursor=0, sent=0, failed=0, message_id=None,
+                 segment=None, media_type=None, media_file_id=None, throttle=False):
+        self.broadcast_id = broadcast_id
+        self.admin_id = admin_id
+        self.text = text
+        self.total = total
+        self.segment = segment
+        self.media_type = media_type
+        self.media_file_id = media_file_id
+        self.throttle = throttle
+        self.limiter = None  # per-broadcast bucket used during busy hours
+        self.cursor = cursor
+        self.sent = sent
+        self.failed = failed
+        self.unreachable = []  # (user_id, reason) not yet written to the database
+        self.pruned = 0
+        self.status = 'running'
+        self.started = time.monotonic()
+        self.resumed_from = sent + failed
+        self.message_id = message_id
+        self.task = None
+        self._dispatched = deque()
+        self._completed = set()
+    
+    @classmethod
+    def from_job(cls, job):
+        """Rebuild a broadcast from its broadcast_jobs row"""
+        return cls(
+            job['job_id'], job['admin_id'], job['message_text'], job['total_count'],
+            cursor=job['cursor_user_id'], sent=job['sent_count'], failed=job['failed_count'],
+            message_id=job['progress_message_id'],
+            segment=json.loads(job['segment']) if job['segment'] else None,
+            media_type=job['media_type'], media_file_id=job['media_file_id'],
+            throttle=bool(job['throttle'])
+        )
+    
+    def dispatched(self, user_id):
+        self._dispatched.append(user_id)
+    
+    def completed(self, user_id):
+        self._completed.add(user_id)
+        while self._dispatched and self._dispatched[0] in self._completed:
+            self.cursor = self._dispatched.popleft()
+            self._completed.discard(self.cursor)
+    
+    def progress_text(self):
+        """Progress report shown to the admin"""
+        done = self.sent + self.failed
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        rate = (done - self.resumed_from) / elapsed
+        titles = {
+            'running': "📤 جاري إرسال الرسالة...",
+            'done': "✅ اكتمل إرسال الرسالة",
+            'cancelled': "⏹ تم إيقاف الإرسال",
+            'failed': "❌ توقف الإرسال بسبب خطأ",
+            'paused': "⏸ توقف الإرسال مؤقتاً وسيُستأنف بعد إعادة التشغيل",
+        }
+        
+        text = (
+            f"{titles[self.status]}\n\n"
+            f"🎯 الفئة: {describe_segment(self.segment)}\n"
+            f"📎 المحتوى: {MEDIA_NAMES.get(self.media_type, 'نص')}\n"
+        )
+        if self.throttle:
+            text += "🐢 إبطاء في أوقات الذروة\n"
+        text += (
+            f"👥 المستهدفون: {Utils.format_number(self.total)}\n"
+            f"✅ نجح: {Utils.format_number(self.sent)}\n"
+            f"❌ فشل: {Utils.format_number(self.failed)}\n"
+            f"🚫 غير متاحين (تم استبعادهم): {Utils.format_number(self.pruned)}\n"
+            f"⚡ المعدل: {rate:.1f} رسالة/ث"
+        )
+        if self.status == 'running' and rate > 0 and self.total > done:
+            text += f"\n⏳ الوقت المتبقي: ~{int((self.total - done) / rate)} ث"
+        return text
+
+
+class BroadcastEngine:
+    """Sends broadcasts in the background under a global rate limit.
+    
+    Recipients are paged from the database into a bounded queue drained by
+    ``concurrency`` workers. Every send takes a token from the shared
+    limiter, and a RetryAfter pauses the limiter so all workers back off
+    together. The admin's progress message is edited, and the job's cursor
+    checkpointed, every ``progress_interval`` seconds.
+    
+    Jobs live in the broadcast_jobs table: ``shutdown`` drains in-flight
+    sends and checkpoints, and ``resume`` restarts unfinished jobs from their
+    cursor, so a restart neither skips nor repeats recipients.
+    
+    Scheduled jobs wait in the same table and are fired by the JobQueue;
+    throttled ones also take from a ``busy_rate`` bucket during
+    ``busy_hours`` so they leave the API budget to interactive traffic.
+    """
+    
+    def __init__(self, db, limiter, concurrency=20, batch_size=1000, progress_interval=5, max_retries=3,
+                 busy_hours=None, busy_rate=5, tz=timezone.utc):
+        self.db = db
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+        self.busy_hours = busy_hours
+        self.busy_rate = busy_rate
+        self.tz = tz
+        self.broadcasts = {}
+        self._stopping = False
+    
+    def is_busy(self, now=None):
+        """Whether the current local hour falls inside the busy hours"""
+        if not self.busy_hours:
+            return False
+        hour = (now or datetime.now(self.tz)).hour
+        start, end = self.busy_hours
+        return start <= hour < end if start <= end else hour >= start or hour < end
+    
+    async def _resolve_media(self, media):
+        if not media:
+            return None, None
+        media_type, file_id, file_unique_id = media
+        return media_type, await self.db.cache_media_file(file_unique_id, media_type, file_id)
+    
+    async def start(self, bot, admin_id, text, segment=None, media=None):
+        """Start a broadcast to a segment (default: everyone) and return its state.
+        
+        media is (media_type, file_id, file_unique_id) from message_media();
+        text is then sent as its caption.
+        """
+        media_type, media_file_id = await self._resolve_media(media)
+        total = await self.db.count_broadcast_recipients(segment)
+        job_id = await self.db.create_broadcast_job(admin_id, text, total, segment, media_type, media_file_id)
+        broadcast = Broadcast(
+            job_id, admin_id, text, total,
+            segment=segment, media_type=media_type, media_file_id=media_file_id
+        )
+        await self._launch(bot, broadcast)
+        return broadcast
+    
+    async def resume(self, bot):
+        """Restart every broadcast job that was interrupted by a shutdown"""
+        resumed = []
+        for job in await self.db.get_running_broadcast_jobs():
+            if job['job_id'] in self.broadcasts:
+                continue
+            broadcast = Broadcast.from_job(job)
+            logger.info(f"Resuming broadcast {broadcast.broadcast_id} after user {broadcast.cursor}")
+            await self._launch(bot, broadcast)
+            resumed.append(broadcast)
+        return resumed
+    
+    async def schedule(self, job_queue, admin_id, text, run_at, segment=None, media=None, throttle=False):
+        """Persist a broadcast to start at run_at (aware datetime) and queue it; returns the job_id"""
+        media_type, media_file_id = await self._resolve_media(media)
+        run_at = run_at.astimezone(timezone.utc)
+        job_id = await self.db.create_broadcast_job(
+            admin_id, text, 0, segment, media_type, media_file_id,
+            scheduled_for=run_at.replace(tzinfo=None), throttle=throttle
+        )
+        self._queue(job_queue, job_id, run_at)
+        return job_id
+    
+    async def restore_schedule(self, job_queue):
+        """Queue every scheduled broadcast again after a restart"""
+        jobs = await self.db.get_scheduled_broadcast_jobs()
+        for job in jobs:
+            self._queue(job_queue, job['job_id'], self.scheduled_time(job))
+        return len(jobs)
+    
+    async def unschedule(self, job_queue, job_id):
+        """Cancel a scheduled broadcast that has not started yet"""
+        for queued in job_queue.get_jobs_by_name(f"broadcast_{job_id}"):
+            queued.schedule_removal()
+        return await self.db.cancel_scheduled_broadcast_job(job_id)
+    
+    @staticmethod
+    def scheduled_time(job):
+        """A job's scheduled_for as an aware UTC datetime"""
+        value = job['scheduled_for']
+        if isinstance(value, str):
+            value = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+        return value.replace(tzinfo=timezone.utc)
+    
+    def _queue(self, job_queue, job_id, run_at):
+        # Overdue jobs (missed while the bot was down) start right away
+        delay = max((run_at - datetime.now(timezone.utc)).total_seconds(), 0)
+        job_queue.run_once(self._run_scheduled, delay, data=job_id, name=f"broadcast_{job_id}")
+    
+    async def _run_scheduled(self, context):
+        """JobQueue callback: start a scheduled broadcast"""
+        job_id = context.job.data
+        job = await self.db.get_broadcast_job(job_id)
+        if not job or job['status'] != 'scheduled':
+            return
+        segment = json.loads(job['segment']) if job['segment'] else None
+        total = await self.db.count_broadcast_recipients(segment)
+        # The claim fails if the job was cancelled in the meantime
+        if not await self.db.claim_scheduled_broadcast_job(job_id, total):
+            return
+        job = await self.db.get_broadcast_job(job_id)
+        logger.info(f"Starting scheduled broadcast {job_id}")
+        await self._launch(context.bot, Broadcast.from_job(job))
+    
+    async def _launch(self, bot, broadcast):
+        self.broadcasts[broadcast.broadcast_id] = broadcast
+        if broadcast.throttle:
+            broadcast.limiter = TokenBucket(self.busy_rate)
+        try:
+            message = await bot.send_message(
+                broadcast.admin_id,
+                broadcast.progress_text(),
+                reply_markup=Keyboards.broadcast_progress_keyboard(broadcast.broadcast_id)
+            )
+            broadcast.message_id = message.message_id
+            await self.db.set_broadcast_job_message(broadcast.broadcast_id, message.message_id)
+        except TelegramError as e:
+            logger.warning(f"Could not post progress for broadcast {broadcast.broadcast_id}: {e}")
+        broadcast.task = asyncio.create_task(self._run(bot, broadcast))
+    
+    def cancel(self, broadcast_id):
+        """Stop a running broadcast; returns False if it is not running"""
+        broadcast = self.broadcasts.get(broadcast_id)
+        if not broadcast or broadcast.status != 'running':
+            return False
+        broadcast.status = 'cancelled'
+        return True
+    
+    async def shutdown(self, timeout=30):
+        """Stop fetching recipients, let queued sends finish and checkpoint"""
+        self._stopping = True
+        tasks = [broadcast.task for broadcast in self.broadcasts.values() if broadcast.task]
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    
+    async def _run(self, bot, broadcast):
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(bot, broadcast, queue)) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(self._report(bot, broadcast))
+        
+        try:
+            batches = self.db.stream(
+                'iter_broadcast_recipients', broadcast.cursor, self.batch_size, broadcast.segment
+            )
+            try:
+                async for batch in batches:
+                    # Checked per recipient so a stop only waits for the queued sends
+                    for user_id in batch:
+                        if broadcast.status != 'running' or self._stopping:
+                            break
+                        broadcast.dispatched(user_id)
+                        await queue.put(user_id)
+                    if broadcast.status != 'running' or self._stopping:
+                        break
+            finally:
+                await batches.aclose()
+            await queue.join()
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast.broadcast_id} failed: {e}")
+            broadcast.status = 'failed'
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+            if broadcast.status == 'running':
+                broadcast.status = 'paused' if self._stopping else 'done'
+            await self._checkpoint(broadcast)
+            await self._show_progress(bot, broadcast)
+            self.broadcasts.pop(broadcast.broadcast_id, None)
+        
+        if broadcast.status != 'paused':
+            await self.db.log_admin_action(
+                broadcast.admin_id,
+                "broadcast",
+                f"Broadcast #{broadcast.broadcast_id} {broadcast.status}: "
+                f"sent to {broadcast.sent} users, failed {broadcast.failed}"
+            )
+    
+    async def _checkpoint(self, broadcast):
+        # A paused job stays 'running' in the database so resume() picks it up
+        status = None if broadcast.status in ('running', 'paused') else broadcast.status
+        unreachable, broadcast.unreachable = broadcast.unreachable, []
+        try:
+            await self.db.mark_users_unreachable(unreachable)
+            await self.db.checkpoint_broadcast_job(
+                broadcast.broadcast_id, broadcast.cursor, broadcast.sent, broadcast.failed, status
+            )
+        except Exception as e:
+            logger.error(f"Could not checkpoint broadcast {broadcast.broadcast_id}: {e}")
+    
+    async def _worker(self, bot, broadcast, queue):
+        while True:
+            user_id = await queue.get()
+            try:
+                # After a cancel the queue is only drained, not sent
+                if broadcast.status == 'running':
+                    delivered, reason = await self._deliver(bot, broadcast, user_id)
+                    if delivered:
+                        broadcast.sent += 1
+                    else:
+                        broadcast.failed += 1
+                        if reason:
+                            broadcast.unreachable.append((user_id, reason))
+                            broadcast.pruned += 1
+                    broadcast.completed(user_id)
+            finally:
+                queue.task_done()
+    
+    async def _deliver(self, bot, broadcast, user_id):
+        """Send to one user, retrying flood waits and network errors.
+        
+        Returns (delivered, unreachable_reason).
+        """
+        attempts = 0
+        while True:
+            if broadcast.limiter and self.is_busy():
+                await broadcast.limiter.acquire()
+            await self.limiter.acquire()
+            try:
+                await self._send(bot, broadcast, user_id)
+                return True, None
+            except RetryAfter as e:
+                logger.warning(f"Flood limit hit, pausing broadcasts for {e.retry_after}s")
+                self.limiter.pause(e.retry_after)
+            except (Forbidden, BadRequest) as e:
+                return False, unreachable_reason(e)
+            except NetworkError:
+                attempts += 1
+                if attempts > self.max_retries:
+                    return False, None
+                await asyncio.sleep(2 ** attempts)
+            except TelegramError:
+                return False, None
+    
+    async def _send(self, bot, broadcast, user_id):
+        # Media goes out by file_id: Telegram already has it, nothing is re-uploaded
+        if broadcast.media_type:
+            send = getattr(bot, MEDIA_SENDERS[broadcast.media_type])
+            await send(
+                user_id, broadcast.media_file_id, caption=broadcast.text or None,
+                rate_limit_args={'priority': PRIORITY_BULK}
+            )
+        else:
+            await bot.send_message(user_id, broadcast.text, rate_limit_args={'priority': PRIORITY_BULK})
+    
+    async def _report(self, bot, broadcast):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._checkpoint(broadcast)
+            await self._show_progress(bot, broadcast)
+    
+    async def _show_progress(self, bot, broadcast):
+        if broadcast.message_id is None:
+            return
+        running = broadcast.status == 'running'
+        try:
+            await bot.edit_message_text(
+                broadcast.progress_text(),
+                chat_id=broadcast.admin_id,
+                message_id=broadcast.message_id,
+                reply_markup=Keyboards.broadcast_progress_keyboard(broadcast.broadcast_id) if running else None
+            )
+        except TelegramError:
+            pass
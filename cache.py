@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+    
+    Read-through callers take a token for the key before querying the
+    database and pass it to ``put``; a fill is dropped if that key was
+    invalidated in between, so a slow read can never overwrite a newer write
+    with a stale row. Versions are kept per key, so writes to other keys do
+    not reject the fill.
+    """
+    
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._versions = OrderedDict()  # key -> invalidation count, most recent last
+        self._epoch = 0  # bumped by clear() and when a version is evicted
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'stale_fills': 0,
+        }
+    
+    def get(self, key, default=None):
+        """Return a fresh cached value, or default on a miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return value
+                del self._data[key]
+            self._counters['misses'] += 1
+            return default
+    
+    def token(self, key):
+        """Snapshot to pass to put() when filling key after a database read"""
+        with self._lock:
+            return self._token(key)
+    
+    def _token(self, key):
+        return (self._epoch, self._versions.get(key, 0))
+    
+    def put(self, key, value, token=None, ttl=None):
+        """Store a value unless an invalidation happened since token was taken.
+        
+        ttl overrides the cache-wide TTL for this entry.
+        """
+        if not self.maxsize:
+            return False
+        with self._lock:
+            if token is not None and token != self._token(key):
+                self._counters['stale_fills'] += 1
+                return False
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._counters['evictions'] += 1
+            return True
+    
+    def invalidate(self, key):
+        """Drop a key and reject any fill that was in flight for it"""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._versions.move_to_end(key)
+            if len(self._versions) > max(self.maxsize, 1):
+                # A forgotten version would read as 0 again; move every token on instead
+                self._versions.popitem(last=False)
+                self._epoch += 1
+            self._data.pop(key, None)
+            self._counters['invalidations'] += 1
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._epoch += 1
+            self._versions.clear()
+            self._data.clear()
+    
+    def stats(self):
+        """Snapshot of cache usage"""
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hit_rate': round(stats['hits'] * 100 / lookups, 1) if lookups else 0.0,
+            })
+            return stats
@@ -7,6 +7,28 @@ class Config:
     
     # Database
     DB_NAME = os.getenv('DB_NAME', 'bot_database.db')
+    DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', '8'))
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+    DB_POOL_ACQUIRE_TIMEOUT = int(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '10'))
+    DB_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
+    SQLITE_READERS = int(os.getenv('SQLITE_READERS', '4'))
+    SQLITE_WRITE_BATCH_SIZE = int(os.getenv('SQLITE_WRITE_BATCH_SIZE', '64'))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', '268435456'))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+    
+    # Channel membership checks
+    MEMBERSHIP_CHECK_CONCURRENCY = int(os.getenv('MEMBERSHIP_CHECK_CONCURRENCY', '10'))
+    MEMBERSHIP_CHECK_TIMEOUT = float(os.getenv('MEMBERSHIP_CHECK_TIMEOUT', '5'))
+    MEMBERSHIP_CACHE_SIZE = int(os.getenv('MEMBERSHIP_CACHE_SIZE', '50000'))
+    MEMBERSHIP_POSITIVE_TTL = int(os.getenv('MEMBERSHIP_POSITIVE_TTL', '600'))
+    MEMBERSHIP_NEGATIVE_TTL = int(os.getenv('MEMBERSHIP_NEGATIVE_TTL', '15'))
+    SUBSCRIPTION_BATCH_SIZE = int(os.getenv('SUBSCRIPTION_BATCH_SIZE', '100'))
+    SUBSCRIPTION_FLUSH_INTERVAL = float(os.getenv('SUBSCRIPTION_FLUSH_INTERVAL', '2'))
     
     # Points System
     POINTS_PER_CHANNEL_JOIN = int(os.getenv('POINTS_PER_CHANNEL_JOIN', '10'))
@@ -24,6 +46,35 @@ class Config:
     MAX_POINTS_PER_USER = int(os.getenv('MAX_POINTS_PER_USER', '100000'))
     ORDER_COOLDOWN = int(os.getenv('ORDER_COOLDOWN', '300'))
     MAINTENANCE_MODE = os.getenv('MAINTENANCE_MODE', 'false').lower() == 'true'
+    ADMIN_ORDERS_PAGE_SIZE = int(os.getenv('ADMIN_ORDERS_PAGE_SIZE', '10'))
+    CHANNELS_PAGE_SIZE = int(os.getenv('CHANNELS_PAGE_SIZE', '8'))
+    STATS_RECONCILE_INTERVAL = int(os.getenv('STATS_RECONCILE_INTERVAL', '3600'))
+    
+    # Broadcasts
+    BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+    BROADCAST_BURST = int(os.getenv('BROADCAST_BURST', '25'))
+    BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+    BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '1000'))
+    BROADCAST_PROGRESS_INTERVAL = int(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
+    BROADCAST_BUSY_HOURS = os.getenv('BROADCAST_BUSY_HOURS', '')
+    BROADCAST_BUSY_RATE = float(os.getenv('BROADCAST_BUSY_RATE', '5'))
+    TIMEZONE = os.getenv('TIMEZONE', 'UTC')
+    
+    # User notifications (order and points events)
+    NOTIFICATION_CONCURRENCY = int(os.getenv('NOTIFICATION_CONCURRENCY', '4'))
+    NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', '50'))
+    NOTIFICATION_MAX_RETRIES = int(os.getenv('NOTIFICATION_MAX_RETRIES', '3'))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+    OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+    OUTBOX_LEASE = int(os.getenv('OUTBOX_LEASE', '60'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+    
+    # Outbound Bot API limits shared by replies, notifications and broadcasts
+    OUTBOUND_RATE = float(os.getenv('OUTBOUND_RATE', '30'))
+    OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+    OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+    OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', '0.33'))
+    OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '1'))
     
     # Messages
     WELCOME_MESSAGE = """
@@ -0,0 +1,186 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the acquire timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable database connections.
+    
+    Connections are created lazily up to ``max_size``, recycled after
+    ``max_lifetime`` seconds and health-checked before reuse when they have
+    been idle longer than ``health_check_interval`` seconds.
+    """
+    
+    def __init__(self, connect, min_size=1, max_size=10, max_lifetime=1800,
+                 acquire_timeout=10, health_check_interval=30, health_check=None):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.health_check = health_check
+        
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, created_at, last_used)]
+        self._created_at = {}
+        self._size = 0
+        self._closed = False
+        self._counters = {
+            'acquired': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+        }
+        
+        for _ in range(min_size):
+            conn = self._create()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+    
+    def _create(self):
+        conn = self.connect()
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self._counters['created'] += 1
+        return conn
+    
+    def _discard(self, conn):
+        """Close a connection and free its slot (caller must hold the lock)"""
+        self._created_at.pop(id(conn), None)
+        self._size -= 1
+        self._counters['discarded'] += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _is_usable(self, conn, created_at, last_used):
+        now = time.monotonic()
+        if getattr(conn, 'closed', 0):
+            return False
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if self.health_check and now - last_used > self.health_check_interval:
+            try:
+                self.health_check(conn)
+            except Exception:
+                with self._cond:
+                    self._counters['health_check_failures'] += 1
+                return False
+        return True
+    
+    def acquire(self, timeout=None):
+        """Check a connection out of the pool"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._counters['waits'] += 1
+                    self._cond.wait(remaining)
+            
+            if entry is None:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                break
+            
+            conn, created_at, last_used = entry
+            if self._is_usable(conn, created_at, last_used):
+                break
+            with self._cond:
+                self._discard(conn)
+        
+        with self._cond:
+            self._counters['acquired'] += 1
+            self._counters['wait_time_total'] += time.monotonic() - started
+        return conn
+    
+    def release(self, conn, discard=False):
+        """Return a connection to the pool"""
+        with self._cond:
+            created_at = self._created_at.get(id(conn))
+            expired = (
+                created_at is None
+                or (self.max_lifetime and time.monotonic() - created_at > self.max_lifetime)
+            )
+            if discard or expired or self._closed or getattr(conn, 'closed', 0):
+                self._discard(conn)
+                return
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, committing on success and rolling back on error"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            # Includes GeneratorExit when a streaming generator is closed early
+            broken = False
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            self.release(conn, discard=broken)
+            raise
+        else:
+            self.release(conn)
+    
+    def close(self):
+        """Close idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for conn, _, _ in idle:
+                self._discard(conn)
+            self._cond.notify_all()
+    
+    def stats(self):
+        """Snapshot of pool usage for sizing and monitoring"""
+        with self._cond:
+            acquired = self._counters['acquired']
+            stats = dict(self._counters)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'avg_wait_ms': round(stats.pop('wait_time_total') * 1000 / acquired, 2) if acquired else 0.0,
+            })
+            return stats
@@ -1,13 +1,42 @@
-import sqlite3
 import os
-from datetime import datetime
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from contextlib import contextmanager
 from urllib.parse import urlparse
+from config import Config
+from cache import TTLCache
+from connection_pool import ConnectionPool
+from sqlite_engine import SQLiteEngine
+from migrations import MIGRATIONS, LATEST_VERSION
+
+# Arbitrary key for pg_advisory_xact_lock while migrating
+MIGRATION_LOCK_ID = 7_311_402
+
+# Full-scan queries that rebuild each stats_counters row from the source tables
+STATS_COUNTER_QUERIES = {
+    'total_users': 'SELECT COUNT(*) AS value FROM users',
+    'total_orders': 'SELECT COUNT(*) AS value FROM orders',
+    'pending_orders': "SELECT COUNT(*) AS value FROM orders WHERE status = 'pending'",
+    'completed_orders': "SELECT COUNT(*) AS value FROM orders WHERE status = 'completed'",
+    'cancelled_orders': "SELECT COUNT(*) AS value FROM orders WHERE status = 'cancelled'",
+    'total_channels': 'SELECT COUNT(*) AS value FROM channels WHERE is_active = TRUE',
+    'total_points': 'SELECT COALESCE(SUM(points), 0) AS value FROM users',
+}
 
 class Database:
     def __init__(self, db_name="bot_database.db"):
         self.db_name = db_name
         self.db_type = "sqlite"
         self.connection = None
+        self.pool = None
+        self.sqlite = None
+        self.user_cache = TTLCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL)
+        self.channel_catalog = None  # (version, channels) once loaded
+        self._channel_lock = threading.Lock()
         
         # Check if DATABASE_URL exists (Railway PostgreSQL)
         database_url = os.getenv('DATABASE_URL')
@@ -15,8 +44,6 @@ class Database:
             self.setup_postgresql(database_url)
         else:
             self.setup_sqlite()
-        
-        self.init_database()
     
     def setup_postgresql(self, database_url):
         """Setup PostgreSQL connection for Railway"""
@@ -34,7 +61,18 @@ class Database:
                 'password': parsed.password,
                 'sslmode': 'require'
             }
+            self.psycopg2 = psycopg2
+            self.cursor_factory = RealDictCursor
             self.db_type = "postgresql"
+            self.pool = ConnectionPool(
+                self.connect_postgresql,
+                min_size=Config.DB_POOL_MIN_SIZE,
+                max_size=Config.DB_POOL_MAX_SIZE,
+                max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+                acquire_timeout=Config.DB_POOL_ACQUIRE_TIMEOUT,
+                health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL,
+                health_check=self.ping_postgresql
+            )
             print("✅ PostgreSQL configuration loaded for Railway")
         except ImportError:
             print("❌ psycopg2 not available, falling back to SQLite")
@@ -43,191 +81,134 @@ class Database:
     def setup_sqlite(self):
         """Setup SQLite connection for local development"""
         self.db_type = "sqlite"
+        self.sqlite = SQLiteEngine(
+            self.db_name,
+            readers=Config.SQLITE_READERS,
+            write_batch_size=Config.SQLITE_WRITE_BATCH_SIZE,
+            cache_size_kb=Config.SQLITE_CACHE_SIZE_KB,
+            mmap_size=Config.SQLITE_MMAP_SIZE,
+            busy_timeout_ms=Config.SQLITE_BUSY_TIMEOUT_MS
+        )
         print("✅ SQLite configuration loaded for local development")
     
+    def connect_postgresql(self):
+        """Open a new PostgreSQL connection for the pool"""
+        return self.psycopg2.connect(**self.db_config, cursor_factory=self.cursor_factory)
+    
+    def ping_postgresql(self, conn):
+        """Health check run on idle pooled connections before reuse"""
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+    
+    @contextmanager
     def get_connection(self):
         """Get database connection"""
         if self.db_type == "postgresql":
-            import psycopg2
-            from psycopg2.extras import RealDictCursor
-            return psycopg2.connect(**self.db_config, cursor_factory=RealDictCursor)
+            with self.pool.connection() as conn:
+                yield conn
         else:
-            conn = sqlite3.connect(self.db_name)
-            conn.row_factory = sqlite3.Row
-            return conn
+            with self.sqlite.read() as conn:
+                yield conn
     
-    def init_database(self):
-        """Initialize database tables"""
+    def run_write(self, func):
+        """Run func(cursor) in a write transaction and return its result"""
         if self.db_type == "postgresql":
-            self.init_postgresql_tables()
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    return func(cursor)
         else:
-            self.init_sqlite_tables()
+            return self.sqlite.write(func)
     
-    def init_sqlite_tables(self):
-        """Initialize SQLite tables"""
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    points INTEGER DEFAULT 0,
-                    referral_code TEXT,
-                    referred_by INTEGER,
-                    joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_banned BOOLEAN DEFAULT FALSE,
-                    total_orders INTEGER DEFAULT 0,
-                    total_spent_points INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # Orders table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    service_type TEXT,
-                    target_url TEXT,
-                    quantity INTEGER,
-                    points_cost INTEGER,
-                    status TEXT DEFAULT 'pending',
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_date TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Channels table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS channels (
-                    channel_id TEXT PRIMARY KEY,
-                    channel_name TEXT,
-                    channel_username TEXT,
-                    points_reward INTEGER DEFAULT 10,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # User channel subscriptions
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_subscriptions (
-                    user_id INTEGER,
-                    channel_id TEXT,
-                    subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    points_earned INTEGER DEFAULT 0,
-                    PRIMARY KEY (user_id, channel_id),
-                    FOREIGN KEY (user_id) REFERENCES users (user_id),
-                    FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
-                )
-            ''')
-            
-            # Points transactions
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS points_transactions (
-                    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    points_change INTEGER,
-                    transaction_type TEXT,
-                    description TEXT,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            conn.commit()
-            print("✅ SQLite database initialized successfully")
+    def get_pool_stats(self):
+        """Get connection pool statistics"""
+        if self.db_type == "postgresql":
+            return self.pool.stats()
+        return self.sqlite.stats()
     
-    def init_postgresql_tables(self):
-        """Initialize PostgreSQL tables"""
+    def get_cache_stats(self):
+        """Get user cache statistics"""
+        return self.user_cache.stats()
+    
+    def close(self):
+        """Close pooled connections"""
+        if self.pool is not None:
+            self.pool.close()
+        if self.sqlite is not None:
+            self.sqlite.close()
+    
+    def init_database(self):
+        """Apply any pending schema migrations"""
+        current_version = self.get_schema_version()
+        if current_version >= LATEST_VERSION:
+            print(f"✅ Database schema is up to date (version {current_version})")
+            return
+        
+        for migration in MIGRATIONS:
+            if migration['version'] <= current_version:
+                continue
+            self.apply_migration(migration)
+            print(f"✅ Applied migration {migration['version']}: {migration['description']}")
+    
+    def get_schema_version(self):
+        """Get the highest applied migration version"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    username VARCHAR(100),
-                    first_name VARCHAR(100),
-                    last_name VARCHAR(100),
-                    points INTEGER DEFAULT 0,
-                    referral_code VARCHAR(20),
-                    referred_by BIGINT,
-                    joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_banned BOOLEAN DEFAULT FALSE,
-                    total_orders INTEGER DEFAULT 0,
-                    total_spent_points INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # Orders table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id SERIAL PRIMARY KEY,
-                    user_id BIGINT,
-                    service_type VARCHAR(50),
-                    target_url TEXT,
-                    quantity INTEGER,
-                    points_cost INTEGER,
-                    status VARCHAR(20) DEFAULT 'pending',
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_date TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
+            if self.db_type == "postgresql":
+                cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS present")
+            else:
+                cursor.execute('''
+                    SELECT COUNT(*) > 0 AS present FROM sqlite_master
+                    WHERE type = 'table' AND name = 'schema_migrations'
+                ''')
             
-            # Channels table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS channels (
-                    channel_id VARCHAR(100) PRIMARY KEY,
-                    channel_name VARCHAR(200),
-                    channel_username VARCHAR(100),
-                    points_reward INTEGER DEFAULT 10,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            if not cursor.fetchone()['present']:
+                return 0
             
-            # User channel subscriptions
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_subscriptions (
-                    user_id BIGINT,
-                    channel_id VARCHAR(100),
-                    subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    points_earned INTEGER DEFAULT 0,
-                    PRIMARY KEY (user_id, channel_id),
-                    FOREIGN KEY (user_id) REFERENCES users (user_id),
-                    FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
-                )
-            ''')
+            cursor.execute('SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations')
+            return cursor.fetchone()['version']
+    
+    def apply_migration(self, migration):
+        """Run one migration and record its version in the same transaction"""
+        def write(cursor):
+            if self.db_type == "postgresql":
+                # Serialize concurrent deploys migrating the same database
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
             
-            # Points transactions
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS points_transactions (
-                    transaction_id SERIAL PRIMARY KEY,
-                    user_id BIGINT,
-                    points_change INTEGER,
-                    transaction_type VARCHAR(50),
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
                     description TEXT,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                    applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
-            conn.commit()
-            print("✅ PostgreSQL database initialized successfully")
+            if self.db_type == "postgresql":
+                cursor.execute('SELECT 1 FROM schema_migrations WHERE version = %s', (migration['version'],))
+            else:
+                cursor.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (migration['version'],))
+            if cursor.fetchone():
+                return False
+            
+            for statement in migration[self.db_type]:
+                cursor.execute(statement)
+            
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    INSERT INTO schema_migrations (version, description) VALUES (%s, %s)
+                ''', (migration['version'], migration['description']))
+            else:
+                cursor.execute('''
+                    INSERT INTO schema_migrations (version, description) VALUES (?, ?)
+                ''', (migration['version'], migration['description']))
+            return True
+        
+        return self.run_write(write)
     
     def add_user(self, user_id, username, first_name, last_name=None):
         """Add new user to database"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        def write(cursor):
             if self.db_type == "postgresql":
                 cursor.execute('''
                     INSERT INTO users (user_id, username, first_name, last_name)
@@ -236,19 +217,43 @@ class Database:
                     username = EXCLUDED.username,
                     first_name = EXCLUDED.first_name,
                     last_name = EXCLUDED.last_name,
-                    last_activity = CURRENT_TIMESTAMP
+                    last_activity = CURRENT_TIMESTAMP,
+                    unreachable_reason = NULL,
+                    unreachable_since = NULL
+                    RETURNING (xmax = 0) AS inserted
                 ''', (user_id, username, first_name, last_name))
+                inserted = cursor.fetchone()['inserted']
             else:
+                # INSERT OR REPLACE would delete the old row and reset points
                 cursor.execute('''
-                    INSERT OR REPLACE INTO users (user_id, username, first_name, last_name)
+                    INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
                     VALUES (?, ?, ?, ?)
                 ''', (user_id, username, first_name, last_name))
+                inserted = cursor.rowcount > 0
+                if not inserted:
+                    cursor.execute('''
+                        UPDATE users SET username = ?, first_name = ?, last_name = ?,
+                        last_activity = CURRENT_TIMESTAMP,
+                        unreachable_reason = NULL, unreachable_since = NULL
+                        WHERE user_id = ?
+                    ''', (username, first_name, last_name, user_id))
             
-            conn.commit()
+            if inserted:
+                self._bump_counters(cursor, total_users=1)
             return True
+        
+        try:
+            return self.run_write(write)
+        finally:
+            self.user_cache.invalidate(user_id)
     
     def get_user(self, user_id):
-        """Get user information"""
+        """Get user information, served from the user cache when fresh"""
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        token = self.user_cache.token(user_id)
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -257,42 +262,52 @@ class Database:
             else:
                 cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
             
-            return cursor.fetchone()
+            user = cursor.fetchone()
+        
+        if user is not None:
+            self.user_cache.put(user_id, user, token)
+        return user
     
     def update_user_points(self, user_id, points_change, transaction_type="manual", description=""):
-        """Update user points"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        """Update user points; returns False when the user does not exist"""
+        def write(cursor):
             if self.db_type == "postgresql":
                 cursor.execute('''
                     UPDATE users SET points = points + %s, last_activity = CURRENT_TIMESTAMP
                     WHERE user_id = %s
                 ''', (points_change, user_id))
+                updated = cursor.rowcount > 0
                 
-                cursor.execute('''
-                    INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
-                    VALUES (%s, %s, %s, %s)
-                ''', (user_id, points_change, transaction_type, description))
+                if updated:
+                    cursor.execute('''
+                        INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                        VALUES (%s, %s, %s, %s)
+                    ''', (user_id, points_change, transaction_type, description))
             else:
                 cursor.execute('''
                     UPDATE users SET points = points + ?, last_activity = CURRENT_TIMESTAMP
                     WHERE user_id = ?
                 ''', (points_change, user_id))
+                updated = cursor.rowcount > 0
                 
-                cursor.execute('''
-                    INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, points_change, transaction_type, description))
+                if updated:
+                    cursor.execute('''
+                        INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                        VALUES (?, ?, ?, ?)
+                    ''', (user_id, points_change, transaction_type, description))
             
-            conn.commit()
-            return True
+            if updated:
+                self._bump_counters(cursor, total_points=points_change)
+            return updated
+        
+        try:
+            return self.run_write(write)
+        finally:
+            self.user_cache.invalidate(user_id)
     
     def add_order(self, user_id, service_type, target_url, quantity, points_cost):
         """Add new order"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        def write(cursor):
             if self.db_type == "postgresql":
                 cursor.execute('''
                     INSERT INTO orders (user_id, service_type, target_url, quantity, points_cost)
@@ -307,8 +322,674 @@ class Database:
                 ''', (user_id, service_type, target_url, quantity, points_cost))
                 order_id = cursor.lastrowid
             
-            conn.commit()
+            self._bump_counters(cursor, total_orders=1, pending_orders=1)
             return order_id
+        
+        return self.run_write(write)
+    
+    def create_order_with_debit(self, user_id, service_type, target_url, quantity, points_cost):
+        """Debit points and create an order atomically.
+        
+        Returns a dict with the new order_id and the user's balance, with
+        order_id None when the balance is too low, or None for an unknown user.
+        """
+        params = {
+            'user_id': user_id,
+            'service_type': service_type,
+            'target_url': target_url,
+            'quantity': quantity,
+            'cost': points_cost
+        }
+        
+        def write(cursor):
+            if self.db_type == "postgresql":
+                # One statement: the debit only succeeds while points >= cost,
+                # and the order and ledger rows are inserted only if it did
+                cursor.execute('''
+                    WITH debit AS (
+                        UPDATE users SET
+                        points = points - %(cost)s,
+                        total_orders = total_orders + 1,
+                        total_spent_points = total_spent_points + %(cost)s,
+                        last_activity = CURRENT_TIMESTAMP
+                        WHERE user_id = %(user_id)s AND points >= %(cost)s
+                        RETURNING user_id, points
+                    ),
+                    new_order AS (
+                        INSERT INTO orders (user_id, service_type, target_url, quantity, points_cost)
+                        SELECT user_id, %(service_type)s, %(target_url)s, %(quantity)s, %(cost)s FROM debit
+                        RETURNING order_id, user_id
+                    ),
+                    ledger AS (
+                        INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                        SELECT user_id, -1 * %(cost)s, 'order', 'Order #' || order_id FROM new_order
+                    ),
+                    counters AS (
+                        UPDATE stats_counters SET value = value + CASE name
+                        WHEN 'total_points' THEN -1 * %(cost)s ELSE 1 END
+                        WHERE name IN ('total_orders', 'pending_orders', 'total_points')
+                        AND EXISTS (SELECT 1 FROM new_order)
+                    )
+                    SELECT new_order.order_id, debit.points
+                    FROM debit JOIN new_order ON new_order.user_id = debit.user_id
+                    UNION ALL
+                    SELECT NULL, points FROM users
+                    WHERE user_id = %(user_id)s AND NOT EXISTS (SELECT 1 FROM debit)
+                ''', params)
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                return {'order_id': row['order_id'], 'points': row['points']}
+            else:
+                cursor.execute('''
+                    UPDATE users SET
+                    points = points - :cost,
+                    total_orders = total_orders + 1,
+                    total_spent_points = total_spent_points + :cost,
+                    last_activity = CURRENT_TIMESTAMP
+                    WHERE user_id = :user_id AND points >= :cost
+                ''', params)
+                debited = cursor.rowcount > 0
+                
+                order_id = None
+                if debited:
+                    cursor.execute('''
+                        INSERT INTO orders (user_id, service_type, target_url, quantity, points_cost)
+                        VALUES (:user_id, :service_type, :target_url, :quantity, :cost)
+                    ''', params)
+                    order_id = cursor.lastrowid
+                    
+                    cursor.execute('''
+                        INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                        VALUES (?, ?, 'order', ?)
+                    ''', (user_id, -points_cost, f"Order #{order_id}"))
+                    
+                    self._bump_counters(cursor, total_orders=1, pending_orders=1,
+                                        total_points=-points_cost)
+                
+                cursor.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                return {'order_id': order_id, 'points': row['points']}
+        
+        try:
+            return self.run_write(write)
+        finally:
+            self.user_cache.invalidate(user_id)
+    
+    def get_order(self, order_id):
+        """Get a single order by id"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            if self.db_type == "postgresql":
+                cursor.execute('SELECT * FROM orders WHERE order_id = %s', (order_id,))
+            else:
+                cursor.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,))
+            
+            return cursor.fetchone()
+    
+    def get_orders_page(self, status=None, before_id=None, after_id=None, limit=20):
+        """Get one page of orders, newest first, using keyset pagination.
+        
+        Pass before_id to page towards older orders and after_id to page
+        towards newer ones. Returns the page plus has_older/has_newer flags.
+        """
+        ph = '%s' if self.db_type == "postgresql" else '?'
+        conditions = []
+        params = []
+        
+        if status:
+            conditions.append(f'o.status = {ph}')
+            params.append(status)
+        if before_id is not None:
+            conditions.append(f'o.order_id < {ph}')
+            params.append(before_id)
+        elif after_id is not None:
+            conditions.append(f'o.order_id > {ph}')
+            params.append(after_id)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        direction = 'ASC' if after_id is not None and before_id is None else 'DESC'
+        params.append(limit + 1)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT o.*, u.username FROM orders o
+                LEFT JOIN users u ON u.user_id = o.user_id
+                {where}
+                ORDER BY o.order_id {direction}
+                LIMIT {ph}
+            ''', params)
+            rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        if direction == 'ASC':
+            rows.reverse()
+            return {'orders': rows, 'has_older': True, 'has_newer': has_more}
+        return {'orders': rows, 'has_older': has_more, 'has_newer': before_id is not None}
+    
+    def update_order_status_returning(self, order_id, status, refund=False, notify=None):
+        """Move a pending order to a new status.
+        
+        Returns the updated order's order_id, user_id, points_cost and status,
+        or None when the order does not exist or is no longer pending. With
+        refund=True the points are credited back in the same transaction.
+        notify(order) builds a message for the order's owner that is written
+        to the notification outbox in that transaction too.
+        """
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    UPDATE orders SET status = %s, completed_date = CURRENT_TIMESTAMP
+                    WHERE order_id = %s AND status = 'pending'
+                    RETURNING order_id, user_id, points_cost, status
+                ''', (status, order_id))
+                order = cursor.fetchone()
+                
+                if order and refund:
+                    cursor.execute('''
+                        UPDATE users SET points = points + %s,
+                        total_spent_points = total_spent_points - %s
+                        WHERE user_id = %s
+                    ''', (order['points_cost'], order['points_cost'], order['user_id']))
+                    
+                    cursor.execute('''
+                        INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                        VALUES (%s, %s, 'refund', %s)
+                    ''', (order['user_id'], order['points_cost'], f"Order #{order_id} {status}"))
+            else:
+                # The single writer thread serializes this read-then-update
+                cursor.execute('''
+                    SELECT order_id, user_id, points_cost FROM orders
+                    WHERE order_id = ? AND status = 'pending'
+                ''', (order_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                cursor.execute('''
+                    UPDATE orders SET status = ?, completed_date = CURRENT_TIMESTAMP
+                    WHERE order_id = ?
+                ''', (status, order_id))
+                order = {'order_id': row['order_id'], 'user_id': row['user_id'],
+                         'points_cost': row['points_cost'], 'status': status}
+                
+                if refund:
+                    cursor.execute('''
+                        UPDATE users SET points = points + ?,
+                        total_spent_points = total_spent_points - ?
+                        WHERE user_id = ?
+                    ''', (order['points_cost'], order['points_cost'], order['user_id']))
+                    
+                    cursor.execute('''
+                        INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                        VALUES (?, ?, 'refund', ?)
+                    ''', (order['user_id'], order['points_cost'], f"Order #{order_id} {status}"))
+            
+            if order:
+                deltas = {'pending_orders': -1, f'{status}_orders': 1}
+                if refund:
+                    deltas['total_points'] = order['points_cost']
+                self._bump_counters(cursor, **deltas)
+                if notify:
+                    self._enqueue_notification(
+                        cursor, order['user_id'], notify(order), f"order:{order_id}:{status}"
+                    )
+            return order
+        
+        order = self.run_write(write)
+        if order and refund:
+            self.user_cache.invalidate(order['user_id'])
+        return order
+    
+    def _enqueue_notification(self, cursor, user_id, text, dedupe_key):
+        """Add a message to the outbox inside the caller's transaction; a repeated dedupe_key is ignored"""
+        if self.db_type == "postgresql":
+            cursor.execute('''
+                INSERT INTO notification_outbox (user_id, message_text, dedupe_key)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (dedupe_key) DO NOTHING
+            ''', (user_id, text, dedupe_key))
+        else:
+            cursor.execute('''
+                INSERT OR IGNORE INTO notification_outbox (user_id, message_text, dedupe_key)
+                VALUES (?, ?, ?)
+            ''', (user_id, text, dedupe_key))
+    
+    def claim_outbox_batch(self, limit=50, lease_seconds=60):
+        """Take due outbox messages for delivery.
+        
+        Claimed rows are hidden for lease_seconds; if the process dies before
+        settle_outbox they become due again, so delivery is at-least-once.
+        """
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    UPDATE notification_outbox SET
+                    attempts = attempts + 1,
+                    next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+                    WHERE outbox_id IN (
+                        SELECT outbox_id FROM notification_outbox
+                        WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                        ORDER BY next_attempt_at, outbox_id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING outbox_id, user_id, message_text, attempts
+                ''', (lease_seconds, limit))
+                return sorted(cursor.fetchall(), key=lambda row: row['outbox_id'])
+            else:
+                cursor.execute('''
+                    SELECT outbox_id, user_id, message_text, attempts FROM notification_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                    ORDER BY next_attempt_at, outbox_id
+                    LIMIT ?
+                ''', (limit,))
+                rows = [dict(row) for row in cursor.fetchall()]
+                if not rows:
+                    return []
+                
+                placeholders = ','.join('?' * len(rows))
+                cursor.execute(f'''
+                    UPDATE notification_outbox SET
+                    attempts = attempts + 1,
+                    next_attempt_at = datetime('now', ?)
+                    WHERE outbox_id IN ({placeholders})
+                ''', [f'+{int(lease_seconds)} seconds'] + [row['outbox_id'] for row in rows])
+                for row in rows:
+                    row['attempts'] += 1
+                return rows
+        
+        return self.run_write(write)
+    
+    def settle_outbox(self, sent=(), failed=(), retry=()):
+        """Record delivery results for claimed outbox messages.
+        
+        sent is a list of outbox_ids, failed a list of (outbox_id, error) that
+        will not be retried, retry a list of (outbox_id, delay_seconds, error).
+        """
+        def write(cursor):
+            if self.db_type == "postgresql":
+                for outbox_id in sent:
+                    cursor.execute('''
+                        UPDATE notification_outbox SET status = 'sent', sent_date = CURRENT_TIMESTAMP
+                        WHERE outbox_id = %s
+                    ''', (outbox_id,))
+                for outbox_id, error in failed:
+                    cursor.execute('''
+                        UPDATE notification_outbox SET status = 'failed', last_error = %s
+                        WHERE outbox_id = %s
+                    ''', (error, outbox_id))
+                for outbox_id, delay, error in retry:
+                    cursor.execute('''
+                        UPDATE notification_outbox SET
+                        next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second', last_error = %s
+                        WHERE outbox_id = %s
+                    ''', (delay, error, outbox_id))
+            else:
+                for outbox_id in sent:
+                    cursor.execute('''
+                        UPDATE notification_outbox SET status = 'sent', sent_date = CURRENT_TIMESTAMP
+                        WHERE outbox_id = ?
+                    ''', (outbox_id,))
+                for outbox_id, error in failed:
+                    cursor.execute('''
+                        UPDATE notification_outbox SET status = 'failed', last_error = ?
+                        WHERE outbox_id = ?
+                    ''', (error, outbox_id))
+                for outbox_id, delay, error in retry:
+                    cursor.execute('''
+                        UPDATE notification_outbox SET
+                        next_attempt_at = datetime('now', ?), last_error = ?
+                        WHERE outbox_id = ?
+                    ''', (f'+{int(delay)} seconds', error, outbox_id))
+        
+        return self.run_write(write)
+    
+    def count_pending_outbox(self):
+        """Number of outbox messages not yet delivered"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) AS value FROM notification_outbox WHERE status = 'pending'")
+            return cursor.fetchone()['value']
+    
+    def _segment_filter(self, segment=None):
+        """SQL conditions and parameters selecting the users in a broadcast segment.
+        
+        segment may hold active_days, min_points, max_points, joined_from,
+        joined_to (YYYY-MM-DD, inclusive) and has_ordered; missing keys do not
+        filter. Banned and unreachable users are always excluded.
+        """
+        ph = '%s' if self.db_type == "postgresql" else '?'
+        segment = segment or {}
+        conditions = ['is_banned = FALSE', 'unreachable_reason IS NULL']
+        params = []
+        
+        def timestamp(value):
+            # SQLite stores CURRENT_TIMESTAMP as UTC text, so compare as text
+            return value if self.db_type == "postgresql" else value.strftime('%Y-%m-%d %H:%M:%S')
+        
+        if segment.get('active_days'):
+            conditions.append(f'last_activity >= {ph}')
+            params.append(timestamp(datetime.utcnow() - timedelta(days=segment['active_days'])))
+        if segment.get('min_points') is not None:
+            conditions.append(f'points >= {ph}')
+            params.append(segment['min_points'])
+        if segment.get('max_points') is not None:
+            conditions.append(f'points <= {ph}')
+            params.append(segment['max_points'])
+        if segment.get('joined_from'):
+            conditions.append(f'joined_date >= {ph}')
+            params.append(timestamp(datetime.strptime(segment['joined_from'], '%Y-%m-%d')))
+        if segment.get('joined_to'):
+            conditions.append(f'joined_date < {ph}')
+            params.append(timestamp(datetime.strptime(segment['joined_to'], '%Y-%m-%d') + timedelta(days=1)))
+        if segment.get('has_ordered') is not None:
+            # users.total_orders misses orders from add_order and before it was maintained
+            exists = 'EXISTS (SELECT 1 FROM orders o WHERE o.user_id = users.user_id)'
+            conditions.append(exists if segment['has_ordered'] else f'NOT {exists}')
+        
+        return ' AND '.join(conditions), params
+    
+    def get_broadcast_recipients(self, after_id=0, limit=1000, segment=None):
+        """Get the next batch of broadcast recipient ids after after_id"""
+        where, params = self._segment_filter(segment)
+        ph = '%s' if self.db_type == "postgresql" else '?'
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT user_id FROM users
+                WHERE {where} AND user_id > {ph}
+                ORDER BY user_id LIMIT {ph}
+            ''', params + [after_id, limit])
+            return [row['user_id'] for row in cursor.fetchall()]
+    
+    def iter_broadcast_recipients(self, after_id=0, batch_size=1000, segment=None):
+        """Yield broadcast recipient ids after after_id in batches of batch_size.
+        
+        Postgres streams the whole range through one server-side (named)
+        cursor; SQLite runs one short keyset query per batch so the reader
+        never pins an old WAL snapshot. Either way memory use is one batch.
+        """
+        if self.db_type == "postgresql":
+            where, params = self._segment_filter(segment)
+            with self.get_connection() as conn:
+                with conn.cursor(name=f"broadcast_recipients_{id(conn)}") as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(f'''
+                        SELECT user_id FROM users
+                        WHERE {where} AND user_id > %s
+                        ORDER BY user_id
+                    ''', params + [after_id])
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            return
+                        yield [row['user_id'] for row in rows]
+        else:
+            while True:
+                batch = self.get_broadcast_recipients(after_id, batch_size, segment)
+                if not batch:
+                    return
+                yield batch
+                after_id = batch[-1]
+    
+    def count_referrals(self, user_id):
+        """Number of users referred by user_id"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if self.db_type == "postgresql":
+                cursor.execute('SELECT COUNT(*) AS value FROM users WHERE referred_by = %s', (user_id,))
+            else:
+                cursor.execute('SELECT COUNT(*) AS value FROM users WHERE referred_by = ?', (user_id,))
+            return cursor.fetchone()['value']
+    
+    def get_recent_users(self, limit=20):
+        """Get the most recently joined users with their referral counts"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    SELECT u.user_id, u.username, u.first_name, u.points, u.joined_date,
+                    (SELECT COUNT(*) FROM users r WHERE r.referred_by = u.user_id) AS referrals
+                    FROM users u
+                    ORDER BY u.joined_date DESC LIMIT %s
+                ''', (limit,))
+            else:
+                cursor.execute('''
+                    SELECT u.user_id, u.username, u.first_name, u.points, u.joined_date,
+                    (SELECT COUNT(*) FROM users r WHERE r.referred_by = u.user_id) AS referrals
+                    FROM users u
+                    ORDER BY u.joined_date DESC LIMIT ?
+                ''', (limit,))
+            
+            return cursor.fetchall()
+    
+    def count_broadcast_recipients(self, segment=None):
+        """Count the users a broadcast would be sent to"""
+        where, params = self._segment_filter(segment)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT COUNT(*) AS count FROM users WHERE {where}', params)
+            return cursor.fetchone()['count']
+    
+    def mark_users_unreachable(self, failures):
+        """Exclude users from future broadcasts; failures is [(user_id, reason)].
+        
+        The flag is cleared again when the user next sends /start.
+        """
+        if not failures:
+            return 0
+        
+        def write(cursor):
+            params = [(reason, user_id) for user_id, reason in failures]
+            if self.db_type == "postgresql":
+                cursor.executemany('''
+                    UPDATE users SET unreachable_reason = %s, unreachable_since = CURRENT_TIMESTAMP
+                    WHERE user_id = %s
+                ''', params)
+            else:
+                cursor.executemany('''
+                    UPDATE users SET unreachable_reason = ?, unreachable_since = CURRENT_TIMESTAMP
+                    WHERE user_id = ?
+                ''', params)
+            return len(params)
+        
+        try:
+            return self.run_write(write)
+        finally:
+            for user_id, _ in failures:
+                self.user_cache.invalidate(user_id)
+    
+    def create_broadcast_job(self, admin_id, message_text, total_count, segment=None,
+                             media_type=None, media_file_id=None, scheduled_for=None, throttle=False):
+        """Persist a new broadcast and return its job_id.
+        
+        With scheduled_for (a naive UTC datetime) the job is created as
+        'scheduled' instead of 'running'.
+        """
+        segment = json.dumps(segment) if segment else None
+        status = 'scheduled' if scheduled_for else 'running'
+        if scheduled_for and self.db_type != "postgresql":
+            scheduled_for = scheduled_for.strftime('%Y-%m-%d %H:%M:%S')
+        params = (
+            admin_id, message_text, total_count, segment, media_type, media_file_id,
+            status, scheduled_for, throttle
+        )
+        
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    INSERT INTO broadcast_jobs
+                    (admin_id, message_text, total_count, segment, media_type, media_file_id,
+                     status, scheduled_for, throttle)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING job_id
+                ''', params)
+                return cursor.fetchone()['job_id']
+            else:
+                cursor.execute('''
+                    INSERT INTO broadcast_jobs
+                    (admin_id, message_text, total_count, segment, media_type, media_file_id,
+                     status, scheduled_for, throttle)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', params)
+                return cursor.lastrowid
+        
+        return self.run_write(write)
+    
+    def cache_media_file(self, file_unique_id, media_type, file_id):
+        """Return the file_id to send for a piece of media, caching new media.
+        
+        file_unique_id is the same for identical content, so media that was
+        broadcast before is sent again with the file_id already known to work.
+        """
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    INSERT INTO media_cache (file_unique_id, media_type, file_id)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (file_unique_id) DO UPDATE SET
+                    use_count = media_cache.use_count + 1, last_used = CURRENT_TIMESTAMP
+                    RETURNING file_id
+                ''', (file_unique_id, media_type, file_id))
+                return cursor.fetchone()['file_id']
+            else:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO media_cache (file_unique_id, media_type, file_id)
+                    VALUES (?, ?, ?)
+                ''', (file_unique_id, media_type, file_id))
+                if cursor.rowcount == 0:
+                    cursor.execute('''
+                        UPDATE media_cache SET use_count = use_count + 1, last_used = CURRENT_TIMESTAMP
+                        WHERE file_unique_id = ?
+                    ''', (file_unique_id,))
+                cursor.execute(
+                    'SELECT file_id FROM media_cache WHERE file_unique_id = ?', (file_unique_id,)
+                )
+                return cursor.fetchone()['file_id']
+        
+        return self.run_write(write)
+    
+    def set_broadcast_job_message(self, job_id, message_id):
+        """Remember which admin message shows a broadcast's progress"""
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET progress_message_id = %s WHERE job_id = %s
+                ''', (message_id, job_id))
+            else:
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET progress_message_id = ? WHERE job_id = ?
+                ''', (message_id, job_id))
+            return cursor.rowcount > 0
+        
+        return self.run_write(write)
+    
+    def checkpoint_broadcast_job(self, job_id, cursor_user_id, sent_count, failed_count, status=None):
+        """Save a broadcast's progress; every user_id <= cursor_user_id is done"""
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET
+                    cursor_user_id = %s, sent_count = %s, failed_count = %s,
+                    status = COALESCE(%s, status),
+                    updated_date = CURRENT_TIMESTAMP,
+                    finished_date = CASE WHEN %s IS NULL OR %s = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+                    WHERE job_id = %s
+                ''', (cursor_user_id, sent_count, failed_count, status, status, status, job_id))
+            else:
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET
+                    cursor_user_id = ?, sent_count = ?, failed_count = ?,
+                    status = COALESCE(?, status),
+                    updated_date = CURRENT_TIMESTAMP,
+                    finished_date = CASE WHEN ? IS NULL OR ? = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+                    WHERE job_id = ?
+                ''', (cursor_user_id, sent_count, failed_count, status, status, status, job_id))
+            return cursor.rowcount > 0
+        
+        return self.run_write(write)
+    
+    def get_running_broadcast_jobs(self):
+        """Get broadcasts that were interrupted before they finished"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM broadcast_jobs WHERE status = 'running' ORDER BY job_id")
+            return cursor.fetchall()
+    
+    def get_scheduled_broadcast_jobs(self):
+        """Get broadcasts waiting for their scheduled time, soonest first"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM broadcast_jobs WHERE status = 'scheduled' ORDER BY scheduled_for, job_id")
+            return cursor.fetchall()
+    
+    def get_broadcast_job(self, job_id):
+        """Get one broadcast job"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if self.db_type == "postgresql":
+                cursor.execute('SELECT * FROM broadcast_jobs WHERE job_id = %s', (job_id,))
+            else:
+                cursor.execute('SELECT * FROM broadcast_jobs WHERE job_id = ?', (job_id,))
+            return cursor.fetchone()
+    
+    def claim_scheduled_broadcast_job(self, job_id, total_count):
+        """Move a scheduled broadcast to 'running'; False if it was cancelled or already started"""
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET status = 'running', total_count = %s, updated_date = CURRENT_TIMESTAMP
+                    WHERE job_id = %s AND status = 'scheduled'
+                ''', (total_count, job_id))
+            else:
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET status = 'running', total_count = ?, updated_date = CURRENT_TIMESTAMP
+                    WHERE job_id = ? AND status = 'scheduled'
+                ''', (total_count, job_id))
+            return cursor.rowcount > 0
+        
+        return self.run_write(write)
+    
+    def cancel_scheduled_broadcast_job(self, job_id):
+        """Cancel a broadcast that has not started yet"""
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET status = 'cancelled', finished_date = CURRENT_TIMESTAMP
+                    WHERE job_id = %s AND status = 'scheduled'
+                ''', (job_id,))
+            else:
+                cursor.execute('''
+                    UPDATE broadcast_jobs SET status = 'cancelled', finished_date = CURRENT_TIMESTAMP
+                    WHERE job_id = ? AND status = 'scheduled'
+                ''', (job_id,))
+            return cursor.rowcount > 0
+        
+        return self.run_write(write)
+    
+    def log_admin_action(self, admin_id, action, details=""):
+        """Record an admin action"""
+        def write(cursor):
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    INSERT INTO admin_actions (admin_id, action, details) VALUES (%s, %s, %s)
+                ''', (admin_id, action, details))
+            else:
+                cursor.execute('''
+                    INSERT INTO admin_actions (admin_id, action, details) VALUES (?, ?, ?)
+                ''', (admin_id, action, details))
+            return True
+        
+        return self.run_write(write)
     
     def get_user_orders(self, user_id, limit=10):
         """Get user orders"""
@@ -330,9 +1011,7 @@ class Database:
     
     def add_channel(self, channel_id, channel_name, channel_username, points_reward=10):
         """Add new channel"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        def write(cursor):
             if self.db_type == "postgresql":
                 cursor.execute('''
                     INSERT INTO channels (channel_id, channel_name, channel_username, points_reward)
@@ -341,58 +1020,328 @@ class Database:
                     channel_name = EXCLUDED.channel_name,
                     channel_username = EXCLUDED.channel_username,
                     points_reward = EXCLUDED.points_reward
+                    RETURNING (xmax = 0) AS inserted
                 ''', (channel_id, channel_name, channel_username, points_reward))
+                inserted = cursor.fetchone()['inserted']
             else:
                 cursor.execute('''
-                    INSERT OR REPLACE INTO channels (channel_id, channel_name, channel_username, points_reward)
+                    INSERT OR IGNORE INTO channels (channel_id, channel_name, channel_username, points_reward)
                     VALUES (?, ?, ?, ?)
                 ''', (channel_id, channel_name, channel_username, points_reward))
+                inserted = cursor.rowcount > 0
+                if not inserted:
+                    cursor.execute('''
+                        UPDATE channels SET channel_name = ?, channel_username = ?, points_reward = ?
+                        WHERE channel_id = ?
+                    ''', (channel_name, channel_username, points_reward, channel_id))
             
-            conn.commit()
+            if inserted:
+                self._bump_counters(cursor, total_channels=1)
             return True
+        
+        try:
+            return self.run_write(write)
+        finally:
+            self.reload_channels()
     
     def get_all_channels(self):
-        """Get all active channels"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        """Get all active channels from the in-memory catalog"""
+        return self.get_channel_catalog()[1]
+    
+    def get_channel_catalog(self):
+        """Return (version, channels), loading the catalog on first use.
+        
+        Channels only change through add_channel/remove_channel, which reload
+        the catalog and bump its version, so reads never touch the database.
+        """
+        catalog = self.channel_catalog
+        if catalog is None:
+            catalog = self.reload_channels()
+        return catalog
+    
+    def reload_channels(self):
+        """Reload the active channels and publish them as a new catalog version"""
+        with self._channel_lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('SELECT * FROM channels WHERE is_active = TRUE ORDER BY added_date')
+                channels = tuple(dict(row) for row in cursor.fetchall())
             
-            cursor.execute('SELECT * FROM channels WHERE is_active = TRUE ORDER BY added_date')
-            return cursor.fetchall()
+            version = self.channel_catalog[0] + 1 if self.channel_catalog else 1
+            self.channel_catalog = (version, channels)
+            return self.channel_catalog
     
     def remove_channel(self, channel_id):
         """Remove channel"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        def write(cursor):
             if self.db_type == "postgresql":
-                cursor.execute('DELETE FROM channels WHERE channel_id = %s', (channel_id,))
+                cursor.execute('DELETE FROM channels WHERE channel_id = %s RETURNING is_active', (channel_id,))
+                row = cursor.fetchone()
             else:
+                cursor.execute('SELECT is_active FROM channels WHERE channel_id = ?', (channel_id,))
+                row = cursor.fetchone()
                 cursor.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,))
             
-            conn.commit()
-            return cursor.rowcount > 0
+            if not row:
+                return False
+            if row['is_active']:
+                self._bump_counters(cursor, total_channels=-1)
+            return True
+        
+        try:
+            return self.run_write(write)
+        finally:
+            self.reload_channels()
     
-    def get_stats(self):
-        """Get database statistics"""
+    def check_user_subscription(self, user_id, channel_id):
+        """Check whether a user was already rewarded for a channel"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            stats = {}
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    SELECT 1 FROM user_subscriptions WHERE user_id = %s AND channel_id = %s
+                ''', (user_id, channel_id))
+            else:
+                cursor.execute('''
+                    SELECT 1 FROM user_subscriptions WHERE user_id = ? AND channel_id = ?
+                ''', (user_id, channel_id))
             
-            # Total users
-            cursor.execute('SELECT COUNT(*) as count FROM users')
-            stats['total_users'] = cursor.fetchone()['count']
+            return cursor.fetchone() is not None
+    
+    def get_unclaimed_channels(self, user_id):
+        """Get the active channels a user has not been rewarded for yet"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
             
-            # Total orders
-            cursor.execute('SELECT COUNT(*) as count FROM orders')
-            stats['total_orders'] = cursor.fetchone()['count']
+            if self.db_type == "postgresql":
+                cursor.execute('''
+                    SELECT c.* FROM channels c
+                    WHERE c.is_active = TRUE AND NOT EXISTS (
+                        SELECT 1 FROM user_subscriptions s
+                        WHERE s.user_id = %s AND s.channel_id = c.channel_id
+                    )
+                    ORDER BY c.added_date, c.channel_id
+                ''', (user_id,))
+            else:
+                cursor.execute('''
+                    SELECT c.* FROM channels c
+                    WHERE c.is_active = TRUE AND NOT EXISTS (
+                        SELECT 1 FROM user_subscriptions s
+                        WHERE s.user_id = ? AND s.channel_id = c.channel_id
+                    )
+                    ORDER BY c.added_date, c.channel_id
+                ''', (user_id,))
             
-            # Total channels
-            cursor.execute('SELECT COUNT(*) as count FROM channels WHERE is_active = TRUE')
-            stats['total_channels'] = cursor.fetchone()['count']
+            return cursor.fetchall()
+    
+    def award_subscriptions(self, user_id, awards):
+        """Reward a user for several channels in one transaction.
+        
+        awards is a list of (channel_id, points) pairs. Channels the user was
+        already rewarded for are skipped, so a double tap never pays twice.
+        Returns the (channel_id, points) pairs that were actually awarded.
+        """
+        return self.award_subscriptions_batch({user_id: awards}).get(user_id, [])
+    
+    def award_subscriptions_batch(self, awards_by_user):
+        """Reward several users in one transaction.
+        
+        Takes {user_id: [(channel_id, points), ...]} and returns the same shape
+        holding only what was actually awarded. Users who never started the
+        bot are skipped so they can still claim the channel later.
+        """
+        awards_by_user = {user_id: awards for user_id, awards in awards_by_user.items() if awards}
+        if not awards_by_user:
+            return {}
+        
+        def write(cursor):
+            results = {}
+            total = 0
+            for user_id, awards in awards_by_user.items():
+                awarded = self._award_subscriptions(cursor, user_id, awards)
+                if awarded:
+                    results[user_id] = awarded
+                    total += sum(points for _, points in awarded)
             
-            # Total points in circulation
-            cursor.execute('SELECT COALESCE(SUM(points), 0) as total FROM users')
-            stats['total_points'] = cursor.fetchone()['total']
+            self._bump_counters(cursor, total_points=total)
+            return results
+        
+        try:
+            return self.run_write(write)
+        finally:
+            for user_id in awards_by_user:
+                self.user_cache.invalidate(user_id)
+    
+    def _award_subscriptions(self, cursor, user_id, awards):
+        """Insert the unclaimed subscriptions for one user and credit their points"""
+        if self.db_type == "postgresql":
+            values = ', '.join(['(%s, %s)'] * len(awards))
+            cursor.execute(f'''
+                INSERT INTO user_subscriptions (user_id, channel_id, points_earned)
+                SELECT users.user_id, v.channel_id, v.points
+                FROM users, (VALUES {values}) AS v(channel_id, points)
+                WHERE users.user_id = %s
+                ON CONFLICT (user_id, channel_id) DO NOTHING
+                RETURNING channel_id, points_earned
+            ''', [param for pair in awards for param in pair] + [user_id])
+            awarded = [(row['channel_id'], row['points_earned']) for row in cursor.fetchall()]
+        else:
+            awarded = []
+            for channel_id, points in awards:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO user_subscriptions (user_id, channel_id, points_earned)
+                    SELECT user_id, ?, ? FROM users WHERE user_id = ?
+                ''', (channel_id, points, user_id))
+                if cursor.rowcount > 0:
+                    awarded.append((channel_id, points))
+        
+        if not awarded:
+            return []
+        
+        total = sum(points for _, points in awarded)
+        ledger = [(user_id, points, 'subscription', f"Channel {channel_id}") for channel_id, points in awarded]
+        if self.db_type == "postgresql":
+            cursor.execute('''
+                UPDATE users SET points = points + %s, last_activity = CURRENT_TIMESTAMP
+                WHERE user_id = %s
+            ''', (total, user_id))
+            cursor.executemany('''
+                INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                VALUES (%s, %s, %s, %s)
+            ''', ledger)
+        else:
+            cursor.execute('''
+                UPDATE users SET points = points + ?, last_activity = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            ''', (total, user_id))
+            cursor.executemany('''
+                INSERT INTO points_transactions (user_id, points_change, transaction_type, description)
+                VALUES (?, ?, ?, ?)
+            ''', ledger)
+        
+        return awarded
+    
+    def _bump_counters(self, cursor, **deltas):
+        """Apply counter deltas inside the caller's write transaction"""
+        deltas = [(name, delta) for name, delta in deltas.items() if delta]
+        if not deltas:
+            return
+        
+        if self.db_type == "postgresql":
+            values = ', '.join(['(%s, %s)'] * len(deltas))
+            cursor.execute(f'''
+                UPDATE stats_counters AS s SET value = s.value + d.delta
+                FROM (VALUES {values}) AS d(name, delta)
+                WHERE s.name = d.name
+            ''', [param for pair in deltas for param in pair])
+        else:
+            cursor.executemany(
+                'UPDATE stats_counters SET value = value + ? WHERE name = ?',
+                [(delta, name) for name, delta in deltas]
+            )
+    
+    def get_stats(self):
+        """Get database statistics from the materialized counters"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, value FROM stats_counters')
+            counters = {row['name']: row['value'] for row in cursor.fetchall()}
+        
+        return {name: counters.get(name, 0) for name in STATS_COUNTER_QUERIES}
+    
+    def reconcile_counters(self):
+        """Recompute every counter from the source tables.
+        
+        The full scans run on one read snapshot without locks. Writers bump a
+        counter in the same transaction as the rows it counts, so the drift
+        seen in the snapshot is still the drift after later commits, and it is
+        applied as deltas in a short write. Returns the counters that had
+        drifted as {name: (old, new)}.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if self.db_type == "postgresql":
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+            else:
+                cursor.execute('BEGIN')
+            cursor.execute('SELECT name, value FROM stats_counters')
+            current = {row['name']: row['value'] for row in cursor.fetchall()}
             
-            return stats
\ No newline at end of file
+            drift = {}
+            for name, query in STATS_COUNTER_QUERIES.items():
+                cursor.execute(query)
+                value = cursor.fetchone()['value']
+                if current.get(name) != value:
+                    drift[name] = (current.get(name), value)
+        
+        if drift:
+            deltas = {name: value - (old or 0) for name, (old, value) in drift.items()}
+            self.run_write(lambda cursor: self._bump_counters(cursor, **deltas))
+        return drift
+
+
+class AsyncDatabase:
+    """Awaitable facade over Database for use inside async handlers.
+    
+    Every Database method is exposed as a coroutine that runs on a bounded
+    thread pool, so a slow query never blocks the event loop.
+    """
+    
+    def __init__(self, db_name="bot_database.db", max_workers=None):
+        self.sync = Database(db_name)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.DB_MAX_WORKERS,
+            thread_name_prefix="db"
+        )
+    
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    def __getattr__(self, name):
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+        
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+    
+    async def stream(self, name, *args, **kwargs):
+        """Iterate a Database generator method, fetching each item on the thread pool"""
+        iterator = getattr(self.sync, name)(*args, **kwargs)
+        try:
+            while True:
+                item = await self.run(next, iterator, None)
+                if item is None:
+                    return
+                yield item
+        finally:
+            await self.run(iterator.close)
+    
+    async def get_channel_catalog(self):
+        """Return the channel catalog without a thread hop once it is loaded"""
+        catalog = self.sync.channel_catalog
+        if catalog is None:
+            catalog = await self.run(self.sync.get_channel_catalog)
+        return catalog
+    
+    async def get_all_channels(self):
+        """Get all active channels from the in-memory catalog"""
+        return (await self.get_channel_catalog())[1]
+    
+    async def initialize(self):
+        """Verify the schema version, apply pending migrations and load the channel catalog"""
+        await self.run(self.sync.init_database)
+        await self.run(self.sync.reload_channels)
+    
+    def close(self):
+        """Stop accepting work and release the thread pool"""
+        self.executor.shutdown(wait=True)
+        self.sync.close()
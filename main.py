@@ -1,10 +1,15 @@
 import logging
 import asyncio
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+import signal
+import time
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ChatMemberHandler, filters
 from config import Config
 from handlers import Handlers
 from admin_handlers import AdminHandlers
-from database import Database
+from database import AsyncDatabase
+from membership import SubscriptionTracker
+from rate_limiter import PriorityRateLimiter
 
 # Set up logging
 logging.basicConfig(
@@ -18,65 +23,107 @@ async def main():
     """Main function to run the bot"""
     logger.info("Starting Telegram Bot...")
     
-    # Initialize database
-    db = Database()
+    # Initialize the one database shared by every handler
+    started = time.monotonic()
+    db = AsyncDatabase(Config.DB_NAME)
     await db.initialize()
+    logger.info(f"Database ready in {(time.monotonic() - started) * 1000:.0f} ms")
     
-    # Create application
-    application = Application.builder().token(Config.BOT_TOKEN).build()
+    # Create application; every outbound request goes through the priority limiter
+    rate_limiter = PriorityRateLimiter(
+        overall_rate=Config.OUTBOUND_RATE,
+        chat_rate=Config.OUTBOUND_CHAT_RATE,
+        chat_burst=Config.OUTBOUND_CHAT_BURST,
+        group_rate=Config.OUTBOUND_GROUP_RATE,
+        max_retries=Config.OUTBOUND_MAX_RETRIES
+    )
+    application = Application.builder().token(Config.BOT_TOKEN).rate_limiter(rate_limiter).build()
     
     # Initialize handlers
-    handlers = Handlers(db)
     admin_handlers = AdminHandlers(db)
+    handlers = Handlers(db, admin_handlers)
+    tracker = SubscriptionTracker(
+        db, handlers.membership, admin_handlers.notifications, Config.SUBSCRIPTION_BATCH_SIZE
+    )
     
     # Add handlers
     application.add_handler(CommandHandler("start", handlers.start))
-    application.add_handler(CommandHandler("help", handlers.help))
-    application.add_handler(CommandHandler("earn", handlers.earn))
-    application.add_handler(CommandHandler("order", handlers.order))
+    application.add_handler(CommandHandler("help", handlers.help_command))
+    application.add_handler(CommandHandler("earn", handlers.channels))
+    application.add_handler(CommandHandler("order", handlers.services))
+    application.add_handler(CommandHandler("orders", handlers.orders))
     application.add_handler(CommandHandler("balance", handlers.balance))
     application.add_handler(CommandHandler("profile", handlers.profile))
-    application.add_handler(CommandHandler("leaderboard", handlers.leaderboard))
-    application.add_handler(CommandHandler("support", handlers.support))
+    application.add_handler(CommandHandler("referral", handlers.referral))
     
     # Admin handlers
-    application.add_handler(CommandHandler("admin", admin_handlers.admin_panel))
-    application.add_handler(CommandHandler("stats", admin_handlers.stats))
-    application.add_handler(CommandHandler("broadcast", admin_handlers.broadcast))
-    application.add_handler(CommandHandler("addpoints", admin_handlers.add_points))
-    application.add_handler(CommandHandler("removepoints", admin_handlers.remove_points))
-    application.add_handler(CommandHandler("ban", admin_handlers.ban_user))
-    application.add_handler(CommandHandler("unban", admin_handlers.unban_user))
-    application.add_handler(CommandHandler("setprice", admin_handlers.set_price))
-    application.add_handler(CommandHandler("users", admin_handlers.list_users))
+    application.add_handler(CommandHandler("admin", admin_handlers.admin_menu))
     
     # Callback query handlers
     application.add_handler(CallbackQueryHandler(handlers.button_callback))
-    application.add_handler(CallbackQueryHandler(admin_handlers.admin_callback))
     
     # Message handlers
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_message))
-    application.add_handler(MessageHandler(filters.CONTACT, handlers.handle_contact))
-    application.add_handler(MessageHandler(filters.PHOTO, handlers.handle_photo))
-    application.add_handler(MessageHandler(filters.DOCUMENT, handlers.handle_document))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_text_message))
+    application.add_handler(MessageHandler(
+        filters.PHOTO | filters.VIDEO | filters.Document.ALL, admin_handlers.handle_admin_media
+    ))
+    
+    # Channel joins and leaves (only delivered where the bot is an admin)
+    application.add_handler(ChatMemberHandler(tracker.handle_chat_member, ChatMemberHandler.CHAT_MEMBER))
     
     # Add error handler
     application.add_error_handler(error_handler)
     
+    # Periodic jobs
+    application.job_queue.run_repeating(
+        admin_handlers.reconcile_stats,
+        interval=Config.STATS_RECONCILE_INTERVAL,
+        first=Config.STATS_RECONCILE_INTERVAL
+    )
+    application.job_queue.run_repeating(
+        tracker.flush_job,
+        interval=Config.SUBSCRIPTION_FLUSH_INTERVAL,
+        first=Config.SUBSCRIPTION_FLUSH_INTERVAL
+    )
+    
     # Run the bot
     logger.info("Bot started successfully!")
     await application.initialize()
     await application.start()
-    await application.updater.start_polling(drop_pending_updates=True)
+    # chat_member updates are not delivered unless explicitly requested
+    await application.updater.start_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
+    
+    admin_handlers.notifications.start(application.bot)
+    admin_handlers.outbox.start(application.bot)
+    
+    # Pick up broadcasts interrupted by the last shutdown, and queue scheduled ones
+    await admin_handlers.broadcasts.resume(application.bot)
+    await admin_handlers.broadcasts.restore_schedule(application.job_queue)
+    
+    # Deploys stop the process with SIGTERM; shut down cleanly on it too
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
     
     try:
-        await application.updater.idle()
-    except KeyboardInterrupt:
+        # Run until the process is interrupted
+        await stop.wait()
+    except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("Bot stopped by user")
     finally:
         await application.updater.stop()
         await application.stop()
+        # Buffered joins queue notifications, so flush them before the queue stops
+        await tracker.flush()
+        await admin_handlers.broadcasts.shutdown()
+        await admin_handlers.outbox.stop()
+        await admin_handlers.notifications.stop()
         await application.shutdown()
+        db.close()
 
 async def error_handler(update, context):
     """Handle errors"""
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from telegram import ChatMember
+from telegram.error import TelegramError
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+JOINED_STATUSES = (ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER)
+
+
+class MembershipChecker:
+    """Checks channel membership through the Bot API with bounded concurrency.
+    
+    One semaphore is shared by every caller, so a burst of "check
+    subscriptions" taps cannot flood the Bot API, and each call is capped by
+    a timeout so one slow channel does not hold up the whole check.
+    
+    Results are cached per (channel_id, user_id). Negative results expire
+    after ``negative_ttl`` seconds so a user who has just joined is credited
+    on their next tap; failed checks are never cached.
+    """
+    
+    def __init__(self, concurrency=10, timeout=5, cache_size=50000, positive_ttl=600, negative_ttl=15):
+        self.timeout = timeout
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(cache_size, positive_ttl)
+        self._semaphore = asyncio.Semaphore(concurrency)
+    
+    async def is_member(self, bot, channel_id, user_id):
+        """Return True/False, or None when the membership could not be checked"""
+        key = (channel_id, user_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        token = self.cache.token(key)
+        try:
+            async with self._semaphore:
+                member = await asyncio.wait_for(bot.get_chat_member(channel_id, user_id), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Membership check timed out for {user_id} in {channel_id}")
+            return None
+        except TelegramError as e:
+            logger.warning(f"Membership check failed for {user_id} in {channel_id}: {e}")
+            return None
+        
+        joined = member.status in JOINED_STATUSES
+        self.remember(channel_id, user_id, joined, token)
+        return joined
+    
+    def remember(self, channel_id, user_id, joined, token=None):
+        """Cache a known membership state with the TTL for its polarity"""
+        ttl = self.positive_ttl if joined else self.negative_ttl
+        self.cache.put((channel_id, user_id), joined, token, ttl)
+    
+    def forget(self, channel_id, user_id):
+        """Drop a cached membership state"""
+        self.cache.invalidate((channel_id, user_id))
+    
+    async def check_many(self, bot, channel_ids, user_id):
+        """Check several channels at once; returns {channel_id: True/False/None}"""
+        results = await asyncio.gather(*(self.is_member(bot, channel_id, user_id) for channel_id in channel_ids))
+        return dict(zip(channel_ids, results))
+
+
+class SubscriptionTracker:
+    """Credits channel joins from chat_member updates as they happen.
+    
+    Telegram only sends chat_member updates for chats where the bot is an
+    administrator; for the others check_subscriptions keeps polling
+    get_chat_member as a fallback. Joins are buffered and written in batches
+    off the update path, credited users are notified through the
+    NotificationQueue, and every join or leave also refreshes the membership
+    cache.
+    """
+    
+    def __init__(self, db, membership, notifications=None, batch_size=100):
+        self.db = db
+        self.membership = membership
+        self.notifications = notifications
+        self.batch_size = batch_size
+        self._pending = {}  # user_id -> {channel_id: points}
+        self._pending_count = 0
+        self._channels_version = None
+        self._channels_by_chat = {}
+    
+    async def _channel_for_chat(self, chat):
+        """Find the catalog entry for a chat by numeric id or @username"""
+        version, channels = await self.db.get_channel_catalog()
+        if version != self._channels_version:
+            lookup = {}
+            for channel in channels:
+                key = str(channel['channel_id']).lower()
+                lookup[key if key.startswith('@') or key.lstrip('-').isdigit() else '@' + key] = channel
+            self._channels_by_chat = lookup
+            self._channels_version = version
+        
+        channel = self._channels_by_chat.get(str(chat.id))
+        if channel is None and chat.username:
+            channel = self._channels_by_chat.get('@' + chat.username.lower())
+        return channel
+    
+    async def handle_chat_member(self, update, context):
+        """ChatMemberHandler callback: record a join or leave"""
+        change = update.chat_member
+        if not change or change.new_chat_member.user.is_bot:
+            return
+        
+        channel = await self._channel_for_chat(change.chat)
+        if channel is None:
+            return
+        
+        user_id = change.new_chat_member.user.id
+        was_member = change.old_chat_member.status in JOINED_STATUSES
+        is_member = change.new_chat_member.status in JOINED_STATUSES
+        if was_member == is_member:
+            return
+        
+        self.membership.forget(channel['channel_id'], user_id)
+        self.membership.remember(channel['channel_id'], user_id, is_member)
+        if not is_member:
+            return
+        
+        awards = self._pending.setdefault(user_id, {})
+        if channel['channel_id'] not in awards:
+            awards[channel['channel_id']] = channel['points_reward']
+            self._pending_count += 1
+        if self._pending_count >= self.batch_size:
+            # Write the full batch in the background; flush_job picks up the rest
+            context.application.create_task(self.flush())
+    
+    async def flush(self):
+        """Write buffered joins in one transaction and notify credited users"""
+        if not self._pending:
+            return {}
+        
+        pending, self._pending, self._pending_count = self._pending, {}, 0
+        awards_by_user = {user_id: list(awards.items()) for user_id, awards in pending.items()}
+        try:
+            awarded = await self.db.award_subscriptions_batch(awards_by_user)
+        except Exception as e:
+            logger.error(f"Failed to record {len(awards_by_user)} channel joins: {e}")
+            return {}
+        
+        if self.notifications is not None:
+            for user_id, channels in awarded.items():
+                points = sum(points for _, points in channels)
+                self.notifications.enqueue(user_id, f"🎉 تم منحك {points} نقطة للاشتراك في القنوات!")
+        return awarded
+    
+    async def flush_job(self, context):
+        """Periodic job: flush joins that have not filled a batch yet"""
+        await self.flush()
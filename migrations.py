@@ -0,0 +1,403 @@
+"""Versioned schema migrations.
+
+Each migration runs once, in order, inside its own transaction, and its
+version is recorded in the schema_migrations table. Add schema changes by
+appending a new migration; never edit one that has already shipped.
+"""
+
+MIGRATIONS = [
+    {
+        'version': 1,
+        'description': 'initial schema',
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                points INTEGER DEFAULT 0,
+                referral_code TEXT,
+                referred_by INTEGER,
+                joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_banned BOOLEAN DEFAULT FALSE,
+                total_orders INTEGER DEFAULT 0,
+                total_spent_points INTEGER DEFAULT 0
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                service_type TEXT,
+                target_url TEXT,
+                quantity INTEGER,
+                points_cost INTEGER,
+                status TEXT DEFAULT 'pending',
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_date TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS channels (
+                channel_id TEXT PRIMARY KEY,
+                channel_name TEXT,
+                channel_username TEXT,
+                points_reward INTEGER DEFAULT 10,
+                is_active BOOLEAN DEFAULT TRUE,
+                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS user_subscriptions (
+                user_id INTEGER,
+                channel_id TEXT,
+                subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                points_earned INTEGER DEFAULT 0,
+                PRIMARY KEY (user_id, channel_id),
+                FOREIGN KEY (user_id) REFERENCES users (user_id),
+                FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS points_transactions (
+                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                points_change INTEGER,
+                transaction_type TEXT,
+                description TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+            ''',
+        ],
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id BIGINT PRIMARY KEY,
+                username VARCHAR(100),
+                first_name VARCHAR(100),
+                last_name VARCHAR(100),
+                points INTEGER DEFAULT 0,
+                referral_code VARCHAR(20),
+                referred_by BIGINT,
+                joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_banned BOOLEAN DEFAULT FALSE,
+                total_orders INTEGER DEFAULT 0,
+                total_spent_points INTEGER DEFAULT 0
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id SERIAL PRIMARY KEY,
+                user_id BIGINT,
+                service_type VARCHAR(50),
+                target_url TEXT,
+                quantity INTEGER,
+                points_cost INTEGER,
+                status VARCHAR(20) DEFAULT 'pending',
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_date TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS channels (
+                channel_id VARCHAR(100) PRIMARY KEY,
+                channel_name VARCHAR(200),
+                channel_username VARCHAR(100),
+                points_reward INTEGER DEFAULT 10,
+                is_active BOOLEAN DEFAULT TRUE,
+                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS user_subscriptions (
+                user_id BIGINT,
+                channel_id VARCHAR(100),
+                subscribed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                points_earned INTEGER DEFAULT 0,
+                PRIMARY KEY (user_id, channel_id),
+                FOREIGN KEY (user_id) REFERENCES users (user_id),
+                FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS points_transactions (
+                transaction_id SERIAL PRIMARY KEY,
+                user_id BIGINT,
+                points_change INTEGER,
+                transaction_type VARCHAR(50),
+                description TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+            ''',
+        ],
+    },
+    {
+        'version': 2,
+        'description': 'indexes for order, transaction and user lookups',
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_date)',
+            'CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)',
+            'CREATE INDEX IF NOT EXISTS idx_points_transactions_user_created ON points_transactions (user_id, created_date)',
+            'CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users (referred_by)',
+            'CREATE INDEX IF NOT EXISTS idx_users_joined_date ON users (joined_date)',
+        ],
+        'postgresql': [
+            'CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_date)',
+            'CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)',
+            'CREATE INDEX IF NOT EXISTS idx_points_transactions_user_created ON points_transactions (user_id, created_date)',
+            'CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users (referred_by)',
+            'CREATE INDEX IF NOT EXISTS idx_users_joined_date ON users (joined_date)',
+        ],
+    },
+    {
+        'version': 3,
+        'description': 'admin action log',
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS admin_actions (
+                action_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER,
+                action TEXT,
+                details TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+        ],
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS admin_actions (
+                action_id SERIAL PRIMARY KEY,
+                admin_id BIGINT,
+                action VARCHAR(50),
+                details TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+        ],
+    },
+    {
+        'version': 4,
+        'description': 'status + id index for keyset-paginated order views',
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders (status, order_id)',
+            'DROP INDEX IF EXISTS idx_orders_status',
+        ],
+        'postgresql': [
+            'CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders (status, order_id)',
+            'DROP INDEX IF EXISTS idx_orders_status',
+        ],
+    },
+    {
+        'version': 5,
+        'description': 'materialized counters for admin statistics',
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+            ''',
+            '''
+            INSERT INTO stats_counters (name, value)
+            SELECT 'total_users', COUNT(*) FROM users
+            UNION ALL SELECT 'total_orders', COUNT(*) FROM orders
+            UNION ALL SELECT 'pending_orders', COUNT(*) FROM orders WHERE status = 'pending'
+            UNION ALL SELECT 'completed_orders', COUNT(*) FROM orders WHERE status = 'completed'
+            UNION ALL SELECT 'cancelled_orders', COUNT(*) FROM orders WHERE status = 'cancelled'
+            UNION ALL SELECT 'total_channels', COUNT(*) FROM channels WHERE is_active = TRUE
+            UNION ALL SELECT 'total_points', COALESCE(SUM(points), 0) FROM users
+            ''',
+        ],
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name VARCHAR(50) PRIMARY KEY,
+                value BIGINT NOT NULL DEFAULT 0
+            )
+            ''',
+            '''
+            INSERT INTO stats_counters (name, value)
+            SELECT 'total_users', COUNT(*) FROM users
+            UNION ALL SELECT 'total_orders', COUNT(*) FROM orders
+            UNION ALL SELECT 'pending_orders', COUNT(*) FROM orders WHERE status = 'pending'
+            UNION ALL SELECT 'completed_orders', COUNT(*) FROM orders WHERE status = 'completed'
+            UNION ALL SELECT 'cancelled_orders', COUNT(*) FROM orders WHERE status = 'cancelled'
+            UNION ALL SELECT 'total_channels', COUNT(*) FROM channels WHERE is_active = TRUE
+            UNION ALL SELECT 'total_points', COALESCE(SUM(points), 0) FROM users
+            ''',
+        ],
+    },
+    {
+        'version': 6,
+        'description': 'resumable broadcast jobs',
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER,
+                message_text TEXT,
+                status TEXT DEFAULT 'running',
+                cursor_user_id INTEGER DEFAULT 0,
+                total_count INTEGER DEFAULT 0,
+                sent_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                progress_message_id INTEGER,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_date TIMESTAMP
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)',
+        ],
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                job_id SERIAL PRIMARY KEY,
+                admin_id BIGINT,
+                message_text TEXT,
+                status VARCHAR(20) DEFAULT 'running',
+                cursor_user_id BIGINT DEFAULT 0,
+                total_count INTEGER DEFAULT 0,
+                sent_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                progress_message_id BIGINT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_date TIMESTAMP
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)',
+        ],
+    },
+    {
+        'version': 7,
+        'description': 'track users that broadcasts can no longer reach',
+        'sqlite': [
+            'ALTER TABLE users ADD COLUMN unreachable_reason TEXT',
+            'ALTER TABLE users ADD COLUMN unreachable_since TIMESTAMP',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_users_broadcast_targets ON users (user_id)
+            WHERE is_banned = FALSE AND unreachable_reason IS NULL
+            ''',
+        ],
+        'postgresql': [
+            'ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_reason VARCHAR(20)',
+            'ALTER TABLE users ADD COLUMN IF NOT EXISTS unreachable_since TIMESTAMP',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_users_broadcast_targets ON users (user_id)
+            WHERE is_banned = FALSE AND unreachable_reason IS NULL
+            ''',
+        ],
+    },
+    {
+        'version': 8,
+        'description': 'broadcast segments',
+        'sqlite': [
+            'ALTER TABLE broadcast_jobs ADD COLUMN segment TEXT',
+            'CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)',
+            'CREATE INDEX IF NOT EXISTS idx_users_points ON users (points)',
+        ],
+        'postgresql': [
+            'ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS segment TEXT',
+            'CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)',
+            'CREATE INDEX IF NOT EXISTS idx_users_points ON users (points)',
+        ],
+    },
+    {
+        'version': 9,
+        'description': 'media broadcasts and the file_id cache',
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS media_cache (
+                file_unique_id TEXT PRIMARY KEY,
+                media_type TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                use_count INTEGER DEFAULT 1,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'ALTER TABLE broadcast_jobs ADD COLUMN media_type TEXT',
+            'ALTER TABLE broadcast_jobs ADD COLUMN media_file_id TEXT',
+        ],
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS media_cache (
+                file_unique_id VARCHAR(64) PRIMARY KEY,
+                media_type VARCHAR(20) NOT NULL,
+                file_id TEXT NOT NULL,
+                use_count INTEGER DEFAULT 1,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS media_type VARCHAR(20)',
+            'ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS media_file_id TEXT',
+        ],
+    },
+    {
+        'version': 10,
+        'description': 'scheduled broadcasts',
+        'sqlite': [
+            'ALTER TABLE broadcast_jobs ADD COLUMN scheduled_for TIMESTAMP',
+            'ALTER TABLE broadcast_jobs ADD COLUMN throttle BOOLEAN DEFAULT FALSE',
+        ],
+        'postgresql': [
+            'ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS scheduled_for TIMESTAMP',
+            'ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS throttle BOOLEAN DEFAULT FALSE',
+        ],
+    },
+    {
+        'version': 11,
+        'description': 'notification outbox',
+        'sqlite': [
+            '''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                message_text TEXT NOT NULL,
+                dedupe_key TEXT UNIQUE,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_error TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_date TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+            ON notification_outbox (next_attempt_at) WHERE status = 'pending'
+            ''',
+        ],
+        'postgresql': [
+            '''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                outbox_id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                message_text TEXT NOT NULL,
+                dedupe_key VARCHAR(100) UNIQUE,
+                status VARCHAR(20) DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_error TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_date TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+            ON notification_outbox (next_attempt_at) WHERE status = 'pending'
+            ''',
+        ],
+    },
+]
+
+LATEST_VERSION = MIGRATIONS[-1]['version']
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from broadcast import unreachable_reason
+from rate_limiter import PRIORITY_TRANSACTIONAL
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+class NotificationQueue:
+    """Delivers user notifications from background workers.
+    
+    Handlers call ``enqueue`` and return immediately; a failed send can no
+    longer surface as an error in the admin's handler after the database
+    change has committed. Each worker takes up to ``batch_size`` queued
+    notifications at a time and merges those addressed to the same user into
+    one message. Flood waits and network errors are retried up to
+    ``max_retries`` times; users who blocked the bot are marked unreachable
+    like broadcast recipients. Outcomes are counted in ``stats``.
+    """
+    
+    def __init__(self, db, concurrency=4, batch_size=50, max_retries=3, maxsize=10000):
+        self.db = db
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._queue = asyncio.Queue(maxsize)
+        self._workers = []
+        self._counters = {
+            'enqueued': 0,
+            'sent': 0,
+            'merged': 0,
+            'retried': 0,
+            'failed': 0,
+            'dropped': 0,
+        }
+    
+    def start(self, bot):
+        """Start the delivery workers"""
+        self._workers = [asyncio.create_task(self._worker(bot)) for _ in range(self.concurrency)]
+    
+    async def stop(self, timeout=10):
+        """Deliver what is queued (up to timeout seconds), then stop the workers"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} undelivered notifications on shutdown")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+    
+    def enqueue(self, user_id, text):
+        """Queue a message for a user; returns False if the queue is full"""
+        try:
+            self._queue.put_nowait((user_id, text))
+        except asyncio.QueueFull:
+            self._counters['dropped'] += 1
+            logger.error(f"Notification queue full, dropped message for {user_id}")
+            return False
+        self._counters['enqueued'] += 1
+        return True
+    
+    async def _worker(self, bot):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            try:
+                await self._deliver_batch(bot, batch)
+            except Exception as e:
+                logger.error(f"Notification batch failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _deliver_batch(self, bot, batch):
+        by_user = {}
+        for user_id, text in batch:
+            by_user.setdefault(user_id, []).append(text)
+        
+        unreachable = []
+        for user_id, texts in by_user.items():
+            messages = self._merge(texts)
+            self._counters['merged'] += len(texts) - len(messages)
+            for message in messages:
+                delivered, reason = await self.deliver(bot, user_id, message)
+                if delivered:
+                    self._counters['sent'] += 1
+                    continue
+                self._counters['failed'] += 1
+                if reason:
+                    unreachable.append((user_id, reason))
+                    break
+        
+        if unreachable:
+            await self.db.mark_users_unreachable(unreachable)
+    
+    @staticmethod
+    def _merge(texts):
+        """Join texts into as few messages as the length limit allows"""
+        messages = []
+        for text in texts:
+            if messages and len(messages[-1]) + len(text) + 2 <= MAX_MESSAGE_LENGTH:
+                messages[-1] += "\n\n" + text
+            else:
+                messages.append(text)
+        return messages
+    
+    async def deliver(self, bot, user_id, text):
+        """Send one message; returns (delivered, unreachable_reason)"""
+        attempts = 0
+        while True:
+            try:
+                await bot.send_message(user_id, text, rate_limit_args={'priority': PRIORITY_TRANSACTIONAL})
+                return True, None
+            except RetryAfter as e:
+                wait = e.retry_after
+            except (Forbidden, BadRequest) as e:
+                logger.info(f"Notification to {user_id} not delivered: {e}")
+                return False, unreachable_reason(e)
+            except NetworkError:
+                wait = 2 ** attempts
+            except TelegramError as e:
+                logger.warning(f"Notification to {user_id} failed: {e}")
+                return False, None
+            
+            attempts += 1
+            if attempts > self.max_retries:
+                logger.warning(f"Giving up on notification to {user_id} after {attempts} attempts")
+                return False, None
+            self._counters['retried'] += 1
+            await asyncio.sleep(wait)
+    
+    def stats(self):
+        """Snapshot of delivery counters"""
+        stats = dict(self._counters)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+
+class NotificationOutbox:
+    """Delivers messages from the notification_outbox table.
+    
+    Writers add outbox rows in the same transaction as the change they
+    report (see Database.update_order_status_returning), so a crash can
+    no longer lose a notification after the order was updated. The worker
+    claims due rows in batches under a lease, sends them through the
+    NotificationQueue's delivery path and settles the whole batch in one
+    write. A crash between sending and settling re-sends after the lease
+    expires: delivery is at-least-once, and the dedupe_key keeps the same
+    event from being queued twice. Transient failures back off up to
+    ``max_attempts`` attempts.
+    """
+    
+    def __init__(self, db, sender, batch_size=50, poll_interval=5, lease=60, max_attempts=5):
+        self.db = db
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+    
+    def start(self, bot):
+        """Start draining the outbox"""
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(bot))
+    
+    def wake(self):
+        """Drain now instead of at the next poll, e.g. right after writing a row"""
+        self._wakeup.set()
+    
+    async def stop(self, timeout=10):
+        """Finish the batch in flight and stop; undelivered rows stay in the table"""
+        if not self._task:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox worker did not stop in time")
+        self._task = None
+    
+    async def _run(self, bot):
+        while not self._stopping:
+            try:
+                drained = await self.drain(bot)
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+                drained = 0
+            
+            # A full batch means more rows are probably due
+            if drained >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+    
+    async def drain(self, bot):
+        """Deliver one batch of due messages; returns how many were claimed"""
+        rows = await self.db.claim_outbox_batch(self.batch_size, self.lease)
+        if not rows:
+            return 0
+        
+        results = await asyncio.gather(*(
+            self.sender.deliver(bot, row['user_id'], row['message_text']) for row in rows
+        ))
+        
+        sent, failed, retry, unreachable = [], [], [], []
+        for row, (delivered, reason) in zip(rows, results):
+            if delivered:
+                sent.append(row['outbox_id'])
+            elif reason:
+                failed.append((row['outbox_id'], reason))
+                unreachable.append((row['user_id'], reason))
+            elif row['attempts'] >= self.max_attempts:
+                failed.append((row['outbox_id'], 'max_attempts'))
+            else:
+                retry.append((row['outbox_id'], 30 * 2 ** (row['attempts'] - 1), 'send_failed'))
+        
+        await self.db.settle_outbox(sent, failed, retry)
+        if unreachable:
+            await self.db.mark_users_unreachable(unreachable)
+        return len(rows)
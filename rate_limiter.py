@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``.
+    
+    ``pause`` stops every caller until a deadline, which is how a RetryAfter
+    from Telegram is applied to all senders at once instead of one by one.
+    """
+    
+    def __init__(self, rate=25, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, tokens=1):
+        """Wait until ``tokens`` can be taken from the bucket"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+    
+    def pause(self, seconds):
+        """Block all acquirers for ``seconds`` and drop the accumulated burst"""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = 0
+            self._updated = until
+
+
+# Priority lanes for outbound Bot API requests, most urgent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_TRANSACTIONAL = 1
+PRIORITY_BULK = 2
+
+
+class PriorityTokenBucket(TokenBucket):
+    """Token bucket that hands out tokens to waiters in priority order.
+    
+    Lower numbers win; equal priorities are served first come, first served.
+    When tokens are available and nobody is queued a caller proceeds at once.
+    """
+    
+    def __init__(self, rate=30, capacity=None):
+        super().__init__(rate, capacity)
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher = None
+    
+    def _take(self):
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+    
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        """Wait for a token behind every more urgent waiter"""
+        if not self._waiters and self._take():
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A token granted to a cancelled caller goes back to the bucket
+            if future.done() and not future.cancelled():
+                self._tokens = min(self.capacity, self._tokens + 1)
+            future.cancel()
+            raise
+    
+    async def _dispatch(self):
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if self._take():
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+                continue
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def queued(self):
+        """Number of callers currently waiting, per priority"""
+        counts = {}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                counts[priority] = counts.get(priority, 0) + 1
+        return counts
+
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """Rate limiter for every request the bot sends, with priority lanes.
+    
+    Message-sending endpoints (send*, edit*, copy*, forward*) take a token
+    from a per-chat bucket and then from one global bucket. The global bucket
+    serves interactive replies before transactional notifications before
+    bulk broadcasts, so a broadcast can use the whole budget but never makes
+    a user wait behind it. Other endpoints (getChatMember, answerCallbackQuery,
+    ...) are not limited.
+    
+    The lane is chosen per call with ``rate_limit_args={'priority': ...}``;
+    calls without it count as interactive. A flood wait pauses the global
+    bucket; interactive and transactional calls are retried up to
+    ``max_retries`` times, bulk calls re-raise so the broadcast engine can
+    apply its own back-off.
+    """
+    
+    LIMITED_PREFIXES = ('send', 'edit', 'copy', 'forward')
+    
+    def __init__(self, overall_rate=30, chat_rate=1, chat_burst=3, group_rate=20 / 60, max_retries=1):
+        self.overall = PriorityTokenBucket(overall_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        # Idle per-chat buckets are full again after a few seconds, so expiring them loses nothing
+        self._chats = TTLCache(maxsize=50000, ttl=60)
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self.group_rate, 1) if group else TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats.put(chat_id, bucket)
+        return bucket
+    
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = (rate_limit_args or {}).get('priority', PRIORITY_INTERACTIVE)
+        limited = endpoint.startswith(self.LIMITED_PREFIXES)
+        chat_id = data.get('chat_id')
+        
+        # A retry was not delivered, so it only waits for the global bucket again
+        if limited and chat_id is not None:
+            await self._chat_bucket(chat_id).acquire()
+        
+        attempts = 0
+        while True:
+            if limited:
+                await self.overall.acquire(priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                logger.warning(f"Flood limit hit on {endpoint}, pausing outbound requests for {e.retry_after}s")
+                self.overall.pause(e.retry_after)
+                attempts += 1
+                if priority >= PRIORITY_BULK or attempts > self.max_retries:
+                    raise
+    
+    def stats(self):
+        """Snapshot of waiting requests per lane"""
+        return {
+            'queued': self.overall.queued(),
+            'chats': self._chats.stats()['size'],
+        }
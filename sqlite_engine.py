@@ -0,0 +1,155 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from connection_pool import ConnectionPool
+
+
+class SQLiteEngine:
+    """SQLite access with one long-lived writer and a pool of readers.
+    
+    Writes are queued to a dedicated thread that owns the only writable
+    connection and commits whatever has queued up as one transaction (group
+    commit). Reads use read-only WAL connections, so they never wait on the
+    writer.
+    """
+    
+    def __init__(self, db_name, readers=4, write_batch_size=64, cache_size_kb=65536,
+                 mmap_size=268435456, busy_timeout_ms=5000):
+        self.db_name = db_name
+        self.write_batch_size = write_batch_size
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        
+        self._queue = queue.Queue()
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._writer = threading.Thread(target=self._writer_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+        self._ready.wait()
+        if self._startup_error:
+            raise self._startup_error
+        
+        self.read_pool = ConnectionPool(
+            self._connect_reader,
+            min_size=0,
+            max_size=readers,
+            max_lifetime=0
+        )
+    
+    def _configure(self, conn):
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+    
+    def _connect_writer(self):
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        self._configure(conn)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+    
+    def _connect_reader(self):
+        uri = Path(self.db_name).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._configure(conn)
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+    
+    def _writer_loop(self):
+        try:
+            conn = self._connect_writer()
+        except Exception as e:
+            self._startup_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+            
+            batch = [job]
+            while len(batch) < self.write_batch_size:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+            
+            self._run_batch(conn, batch)
+        
+        conn.close()
+    
+    def _run_batch(self, conn, batch):
+        """Run queued writes in one transaction, isolating each in a savepoint"""
+        done = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except Exception as e:
+            for future, _ in batch:
+                future.set_exception(e)
+            return
+        
+        cursor = conn.cursor()
+        for future, func in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            cursor.execute('SAVEPOINT write_job')
+            try:
+                result = func(cursor)
+            except Exception as e:
+                cursor.execute('ROLLBACK TO write_job')
+                cursor.execute('RELEASE write_job')
+                future.set_exception(e)
+            else:
+                cursor.execute('RELEASE write_job')
+                done.append((future, result))
+        
+        try:
+            conn.execute('COMMIT')
+        except Exception as e:
+            try:
+                conn.execute('ROLLBACK')
+            except Exception:
+                pass
+            for future, _ in done:
+                future.set_exception(e)
+            return
+        
+        for future, result in done:
+            future.set_result(result)
+    
+    def write(self, func):
+        """Run func(cursor) on the writer thread and wait for it to commit"""
+        future = Future()
+        self._queue.put((future, func))
+        return future.result()
+    
+    @contextmanager
+    def read(self):
+        """Borrow a read-only connection"""
+        with self.read_pool.connection() as conn:
+            yield conn
+    
+    def stats(self):
+        """Reader pool statistics plus the current write queue depth"""
+        stats = self.read_pool.stats()
+        stats['write_queue'] = self._queue.qsize()
+        return stats
+    
+    def close(self):
+        """Flush pending writes and close every connection"""
+        self._queue.put(None)
+        self._writer.join()
+        self.read_pool.close()
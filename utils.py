@@ -55,6 +55,17 @@ class Utils:
             return Utils.is_valid_telegram_url(url)
         return False
     
+    @staticmethod
+    def validate_order_data(service_type, url, quantity):
+        """Validate an order before confirmation, returns a list of errors"""
+        errors = []
+        platform = service_type.split('_')[0]
+        if not Utils.validate_service_url(platform, url):
+            errors.append(f"🔗 الرابط غير صالح لخدمة {Utils.format_service_name(service_type)}")
+        if not Utils.is_valid_quantity(quantity, 1, 100000):
+            errors.append("📊 الكمية يجب أن تكون بين 1 و 100,000")
+        return errors
+    
     @staticmethod
     def calculate_points_cost(service_type, quantity):
         """Calculate points cost for service"""
@@ -192,6 +203,18 @@ class Utils:
         
         return text
     
+    @staticmethod
+    def create_order_summary(service_type, url, quantity, cost):
+        """Format an order summary for confirmation"""
+        return (
+            f"📋 ملخص الطلب\n\n"
+            f"🚀 الخدمة: {Utils.format_service_name(service_type)}\n"
+            f"🎯 الرابط: {Utils.truncate_text(url)}\n"
+            f"📊 الكمية: {Utils.format_number(quantity)}\n"
+            f"💰 التكلفة: {Utils.format_number(cost)} نقطة\n\n"
+            f"هل تريد تأكيد الطلب؟"
+        )
+    
     @staticmethod
     def generate_referral_link(user_id, bot_username):
         """Generate referral link for user"""
@@ -264,6 +287,11 @@ class Utils:
         except:
             return "غير معروف"
     
+    @staticmethod
+    def is_admin(user_id):
+        """Check if user is the bot admin"""
+        return user_id == Config.ADMIN_ID
+    
     @staticmethod
     def is_maintenance_mode():
         """Check if bot is in maintenance mode"""